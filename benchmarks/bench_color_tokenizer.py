@@ -0,0 +1,106 @@
+"""Compare the shared vectorized color tokenizer with the three tokenizers it replaced.
+
+Usage: python benchmarks/bench_color_tokenizer.py [--master designs_masterl.xlsx] [--repeat 5] [--scales 1,10]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import wilton_engine as engine  # noqa: E402
+
+
+def legacy_extract_colors_from_text(text):
+    if pd.isna(text) or not text:
+        return []
+    separators = [',', ';', '/', '|', '+', '&', '-']
+    colors = [text]
+    for sep in separators:
+        new_colors = []
+        for color in colors:
+            new_colors.extend(color.split(sep))
+        colors = new_colors
+    cleaned_colors = []
+    for color in colors:
+        color = color.strip().upper()
+        if color and color != 'NAN' and len(color) > 1:
+            cleaned_colors.append(color)
+    return list(set(cleaned_colors))
+
+
+def legacy_text_tokens(df, color_columns):
+    tokens = set()
+    for col in color_columns:
+        for value in df[col].dropna():
+            tokens.update(legacy_extract_colors_from_text(str(value)))
+    return {token.replace(' ', '') for token in tokens}
+
+
+def legacy_option_tokens(df, color_columns):
+    tokens = []
+    for col in color_columns:
+        tokens.extend(df[col].dropna().astype(str).str.split(',|;|/|\\|').explode().str.strip().str.upper().unique())
+    return {token.replace(' ', '') for token in tokens if token and token != 'NAN'}
+
+
+def legacy_filter_tokens(df, color_columns):
+    tokens = set()
+    for _, row in df.iterrows():
+        for col in color_columns:
+            if pd.notna(row[col]):
+                text = str(row[col]).upper()
+                for delimiter in [',', ';', '/', '|', '-', '+', '&']:
+                    text = text.replace(delimiter, ',')
+                tokens.update(c.strip().replace(' ', '') for c in text.split(',') if len(c.strip().replace(' ', '')) > 1)
+    return tokens
+
+
+def shared_tokens(df, color_columns):
+    return set(pd.concat([engine.tokenize_colors(df[col]) for col in color_columns])['key'])
+
+
+def timed(func, *args, repeat=5):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        runs.append(time.perf_counter() - started)
+    return result, statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--master', default=str(REPO_ROOT / 'designs_masterl.xlsx'))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scales', default='1,10', help="comma-separated row multipliers of the design master")
+    args = parser.parse_args()
+
+    master = engine.normalize_workbook_frame(pd.read_excel(args.master))
+    color_columns = engine.resolve_filter_columns(master)['colors']
+    print(f"color columns: {', '.join(color_columns)}")
+    for scale in [int(value) for value in args.scales.split(',')]:
+        df = pd.concat([master] * scale, ignore_index=True)
+        print(f"\n{len(df)} design rows ({scale}x)")
+        shared, shared_time = timed(shared_tokens, df, color_columns, repeat=args.repeat)
+        print(f"{'tokenizer':<28}{'median s':>10}{'tokens':>9}{'vs shared':>11}")
+        print(f"{'shared (tokenize_colors)':<28}{shared_time:>10.4f}{len(shared):>9}{'':>11}")
+        for name, func in (('extract_colors_from_text', legacy_text_tokens),
+                           ('option builder regex', legacy_option_tokens),
+                           ('filter replace-chain', legacy_filter_tokens)):
+            tokens, seconds = timed(func, df, color_columns, repeat=args.repeat)
+            print(f"{name:<28}{seconds:>10.4f}{len(tokens):>9}{seconds / shared_time:>10.1f}x")
+            only_legacy, only_shared = tokens - shared, shared - tokens
+            if only_legacy or only_shared:
+                print(f"    disagrees on {len(only_legacy)} legacy-only and {len(only_shared)} shared-only tokens, "
+                      f"e.g. {sorted(only_legacy)[:3]} / {sorted(only_shared)[:3]}")
+
+
+if __name__ == '__main__':
+    main()
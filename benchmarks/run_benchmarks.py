@@ -0,0 +1,299 @@
+"""Headless benchmark suite for the wilton_engine design/yarn pipeline behind the Streamlit page.
+
+Times workbook parsing, filter-option preparation, the multi-filter search, design-name
+search, the design/yarn merge and Excel export on the bundled workbooks and on synthetic
+copies scaled by --scales, then writes every measurement to a JSON file.
+
+Usage: python benchmarks/run_benchmarks.py [--scales 1,10,100] [--repeat 5] [--output results.json]
+                                           [--compare earlier.json]
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import wilton_engine as engine  # noqa: E402
+
+# Excel sheets stop at 1,048,576 rows including the header, so larger synthetic copies skip parse/export
+EXCEL_MAX_DATA_ROWS = 1048575
+WORKBOOK_DIR = engine.PARSE_CACHE_DIR / 'bench'
+
+
+def scale_frame(raw: pd.DataFrame, scale: int) -> pd.DataFrame:
+    # Copy k of every design is renamed "<name>-X<k>", so the synthetic sheet has scale times the designs
+    if scale == 1:
+        return raw.copy()
+    copies = [raw]
+    for k in range(1, scale):
+        copy = raw.copy()
+        copy['Design Name'] = copy['Design Name'].astype(str) + f'-X{k:03d}'
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def workbook_bytes(raw: pd.DataFrame, name: str, scale: int) -> bytes:
+    if scale == 1:
+        return (REPO_ROOT / name).read_bytes()
+    path = WORKBOOK_DIR / f"{Path(name).stem}-x{scale}.xlsx"
+    if not path.exists():
+        WORKBOOK_DIR.mkdir(parents=True, exist_ok=True)
+        print(f"  writing synthetic {path.name} ({len(raw) * scale:,} rows, cached for later runs)")
+        scale_frame(raw, scale).to_excel(path, index=False)
+    return path.read_bytes()
+
+
+def timed(func, repeat: int):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - started)
+    return result, runs
+
+
+def filter_queries(design_df: pd.DataFrame, color_index: engine.ColorIndex, filter_columns: dict) -> dict:
+    common = sorted(range(len(color_index.keys)), key=lambda i: len(color_index.postings[i]), reverse=True)
+    top = [color_index.labels[i] for i in common[:2]]
+    construction = filter_columns['construction']
+    construction_value = str(design_df[construction].mode().iloc[0]).strip() if construction else None
+    return {
+        'one_color': dict(selected_colors=top[:1], match_all=False),
+        'two_colors_any': dict(selected_colors=top, match_all=False),
+        'two_colors_all': dict(selected_colors=top, match_all=True),
+        'color_and_construction': dict(selected_colors=top[:1], match_all=False, construction=construction_value),
+    }
+
+
+def search_queries(design_df: pd.DataFrame, scale: int) -> dict:
+    # Pick from the original rows so a full name also matches its scale - 1 synthetic copies
+    names = design_df['Design Name'].astype(str)
+    full_name = names.iloc[len(names) // scale // 2]
+    return {'fragment': full_name[:3], 'full_name': full_name, 'miss': 'QQZZQQ'}
+
+
+def run_scale(scale: int, raw_design: pd.DataFrame, raw_yarn: pd.DataFrame, args) -> list:
+    results = []
+
+    def record(stage: str, func, repeat: int = args.repeat, output=None, **info):
+        result, runs = timed(func, repeat)
+        if output:
+            info['output_size'] = output(result)
+        results.append({
+            'scale': scale,
+            'stage': stage,
+            'median_s': statistics.median(runs),
+            'min_s': min(runs),
+            'runs': runs,
+            **info,
+        })
+        print(f"  {stage:<36}{statistics.median(runs):>10.4f}s  {info}")
+        return result
+
+    # Workbook parsing
+    for label, raw, name in (('design', raw_design, 'designs_masterl.xlsx'), ('yarn', raw_yarn, 'designs_yarn.xlsx')):
+        rows = len(raw) * scale
+        if rows > EXCEL_MAX_DATA_ROWS:
+            print(f"  parse.{label}: skipped, {rows:,} rows do not fit in one Excel sheet")
+            continue
+        data = workbook_bytes(raw, name, scale)
+        record(f"parse.{label}.pandas", lambda: engine.normalize_workbook_frame(pd.read_excel(io.BytesIO(data))),
+               repeat=args.parse_repeat, rows=rows, bytes=len(data))
+        record(f"parse.{label}.streaming", lambda: engine.normalize_workbook_frame(engine.read_xlsx_streaming(data)[0]),
+               repeat=args.parse_repeat, rows=rows, bytes=len(data))
+
+    design_df = engine.normalize_workbook_frame(scale_frame(raw_design, scale))
+    yarn_df = engine.normalize_workbook_frame(scale_frame(raw_yarn, scale))
+    buffer = io.BytesIO()
+    yarn_df.to_parquet(buffer, index=False)
+    parquet = buffer.getvalue()
+    record('parse.yarn.parquet_cache', lambda: pd.read_parquet(io.BytesIO(parquet)), rows=len(yarn_df))
+
+    # Indexes built once per loaded workbook
+    filter_columns = record('index.filter_columns', lambda: engine.resolve_filter_columns(design_df))
+    color_index = record('index.color', lambda: engine.ColorIndex.build(design_df, filter_columns['colors']),
+                         rows=len(design_df))
+    yarn_fields = record('index.yarn_fields', lambda: engine.parse_yarn_descriptions(yarn_df['Yarn Description']),
+                         rows=len(yarn_df))
+    record('index.frame_colors', lambda: engine.build_frame_color_table(yarn_df, yarn_fields), rows=len(yarn_df))
+    join_index = record('index.join', lambda: engine.JoinIndex.build(yarn_df), rows=len(yarn_df))
+    item_code_index = record('index.item_code', lambda: engine.ItemCodeIndex.build(yarn_df), rows=len(yarn_df))
+    name_index = record('index.design_name', lambda: engine.DesignNameIndex.build(design_df, yarn_df),
+                        rows=len(design_df) + len(yarn_df))
+    fuzzy_matcher = record('index.fuzzy', lambda: engine.FuzzyNameMatcher.build(name_index.names),
+                           rows=len(name_index.names))
+
+    similarity_index = record('index.similarity',
+                              lambda: engine.SimilarityIndex.build(design_df, color_index, filter_columns),
+                              rows=len(design_df))
+
+    # Filter-option preparation: computed once per dataset version, then read from the Dataset on every rerun
+    record('options', lambda: engine.filter_options(design_df, filter_columns, color_index),
+           output=lambda options: sum(len(values) for values in options.values()))
+    dataset = engine.Dataset(design_df, yarn_df, filter_columns=filter_columns, color_index=color_index,
+                             join_index=join_index, name_index=name_index, fuzzy_matcher=fuzzy_matcher,
+                             item_code_index=item_code_index, similarity_index=similarity_index)
+    dataset.filter_options
+    record('options.rerun', lambda: dataset.filter_options)
+
+    # Multi-filter search
+    filtered = {}
+    for query_name, query in filter_queries(design_df, color_index, filter_columns).items():
+        filtered[query_name] = record(
+            f"filter.{query_name}",
+            lambda: engine.filter_designs(design_df, color_index, filter_columns, **query),
+            output=len,
+        )
+
+    # Design-name search
+    searched = {}
+    for query_name, query in search_queries(design_df, scale).items():
+        def search():
+            name_ids = name_index.substring(query)
+            return design_df.iloc[name_index.design_rows(name_ids)], yarn_df.iloc[name_index.yarn_rows(name_ids)]
+        searched[query_name] = record(f"search.{query_name}", search, output=lambda result: len(result[0]))
+    record('search.suggest', lambda: name_index.suggest(search_queries(design_df, scale)['fragment'], limit=8),
+           output=len)
+    # Misspelled, re-spaced and partial names, as typed into the search box
+    full_name = search_queries(design_df, scale)['full_name']
+    fuzzy_queries = {'typo': full_name[:-2] + 'Q' + full_name[-1:], 'no_separators': full_name.replace(' ', '').lower(),
+                     'partial': full_name[: max(4, len(full_name) // 2)]}
+    for query_name, query in fuzzy_queries.items():
+        record(f"search.fuzzy.{query_name}", lambda: fuzzy_matcher.match(query, limit=8), output=len)
+
+    # Similar designs to one design, as is and with another frame count
+    similar_name = search_queries(design_df, scale)['full_name']
+    record('similar.design', lambda: dataset.similar(similar_name), output=len)
+    record('similar.other_frames', lambda: dataset.similar(similar_name, frames='2'), output=len)
+
+    # Batch BOM lookup of an order list: every 7th original design plus a few misspelled names
+    order_list = [str(name) for name in raw_design['Design Name'].dropna().iloc[::7][:200]]
+    order_list += [name[:-1] + 'Q' for name in order_list[:10]]
+    record('batch.lookup', lambda: engine.batch_lookup(dataset, order_list), output=lambda result: len(result.bom),
+           names=len(order_list))
+
+    # Where-used: designs consuming one yarn item code, every code under a prefix, and a batch of codes
+    item_code = str(raw_yarn['Item Code Number Id Type'].value_counts().index[0])
+    record('where_used.code', lambda: item_code_index.where_used([item_code]), output=len)
+    record('where_used.prefix', lambda: item_code_index.where_used([item_code[:5]], prefix=True), output=len)
+    code_list = list(item_code_index.codes[::10][:100])
+    record('where_used.batch', lambda: engine.where_used_lookup(dataset, code_list),
+           output=lambda result: len(result.where_used), codes=len(code_list))
+
+    # Production plan of 20,000 lines per 1x of data, exploded into yarn demand per item code
+    plan_names = raw_design['Design Name'].dropna().astype(str).to_numpy()
+    plan = pd.DataFrame({'Design Name': np.resize(plan_names, 20000 * scale),
+                         'Quantity': np.resize(np.arange(1, 251, dtype=float), 20000 * scale),
+                         'Unit': np.resize(['sqm', 'sqm', 'pieces'], 20000 * scale)})
+    dataset.yarn_fields
+    record('plan.explode', lambda: engine.explode_plan(dataset, plan), output=lambda result: len(result.demand),
+           lines=len(plan))
+
+    # Command-line jobs: many queries against one loaded dataset
+    cli_queries = [str(name) for name in raw_design['Design Name'].dropna().iloc[::20][:100]]
+    record('cli.search', lambda: engine.run_search(dataset, cli_queries),
+           output=lambda sheets: len(sheets['Complete_Specification']), queries=len(cli_queries))
+
+    # Merge of matched designs with their yarn rows
+    merged = record('merge.search_full_name', lambda: join_index.merge(searched['full_name'][0]), output=len)
+    merged_filter = record('merge.filter_one_color', lambda: join_index.merge(filtered['one_color']), output=len)
+
+    # Windowed result viewer: one page of the merged filter result, as sent to the browser
+    window = engine.ResultWindow(merged_filter)
+    record('window.first_page', lambda: window.page(0, 50), output=len, rows=len(merged_filter))
+    record('window.sorted_page', lambda: engine.ResultWindow(merged_filter).page(10, 50, sort_by='Design Name'),
+           output=len, rows=len(merged_filter))
+    record('window.projected_page', lambda: window.page(10, 50, columns=['Design Name', 'Color']), output=len,
+           rows=len(merged_filter))
+
+    # Export files, as built when a download button is clicked
+    design_matches, yarn_matches = searched['full_name']
+    exports = {
+        'search_full_name': {'Complete_Specification': merged, 'Design_Details': design_matches,
+                             'Yarn_Specifications': yarn_matches},
+        'filter_one_color': {'Filtered_Complete': merged_filter},
+    }
+    for export_name, sheets in exports.items():
+        rows = max(len(sheet) for sheet in sheets.values())
+        for export_format in engine.EXPORT_FORMATS:
+            if export_format == 'xlsx' and rows > min(args.max_xlsx_rows, EXCEL_MAX_DATA_ROWS):
+                print(f"  export.{export_name}.xlsx: skipped, {rows:,} rows is over --max-xlsx-rows")
+                continue
+            record(f"export.{export_name}.{export_format}", lambda: engine.build_export(sheets, export_format),
+                   repeat=args.parse_repeat, output=len, rows=sum(len(sheet) for sheet in sheets.values()))
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: list, baseline_path: str):
+    baseline = {(entry['scale'], entry['stage']): entry['median_s']
+                for entry in json.loads(Path(baseline_path).read_text())['results']}
+    print(f"\nCompared with {baseline_path} (ratio > 1 means this run is slower)")
+    for entry in results:
+        before = baseline.get((entry['scale'], entry['stage']))
+        if before:
+            print(f"  {entry['scale']:>4}x {entry['stage']:<36}{before:>10.4f}s -> {entry['median_s']:>8.4f}s"
+                  f"{entry['median_s'] / before:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1,10,100', help="comma-separated row multipliers of both workbooks")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per in-memory stage (the median is reported)")
+    parser.add_argument('--parse-repeat', type=int, default=1, help="runs per parse and export stage")
+    parser.add_argument('--max-xlsx-rows', type=int, default=200000, help="largest sheet to time an Excel export on")
+    parser.add_argument('--output', default=None, help="JSON file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', default=None, help="earlier JSON result to print per-stage ratios against")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    raw_design = pd.read_excel(REPO_ROOT / 'designs_masterl.xlsx')
+    raw_yarn = pd.read_excel(REPO_ROOT / 'designs_yarn.xlsx')
+    for raw in (raw_design, raw_yarn):
+        raw.columns = raw.columns.str.strip().str.title()
+    results = []
+    for scale in [int(value) for value in args.scales.split(',')]:
+        print(f"\n{scale}x: {len(raw_design) * scale:,} design rows, {len(raw_yarn) * scale:,} yarn rows")
+        results.extend(run_scale(scale, raw_design, raw_yarn, args))
+
+    output = Path(args.output) if args.output else REPO_ROOT / 'benchmarks' / 'results' / f"{started:%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'meta': {
+            'timestamp': started.isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'parse_repeat': args.parse_repeat,
+        },
+        'results': results,
+    }, indent=2))
+    print(f"\nWrote {len(results)} measurements to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""UI-free data layer behind the Wilton Weavers BOM search page: loading, indexes, filter, search, join and export."""
+from .batch import (BATCH_SUGGESTIONS, BatchLookup, WhereUsedLookup, batch_lookup, parse_name_list, read_name_list,
+                    where_used_lookup)
+from .cli import load_dataset, run_filter, run_search
+from .colors import (COLOR_ALIASES_PATH, COLOR_DELIMITER_PATTERN, canonicalize_colors, color_key, load_color_aliases,
+                     tokenize_colors)
+from .dataset import Dataset
+from .export import EXPORT_FORMATS, ExportCache, build_export, export_file_type, write_xlsx
+from .filters import (COLOR_COLUMN_KEYWORDS, ColorIndex, column_options, equality_mask, filter_designs,
+                      filter_options, resolve_filter_columns)
+from .frames import build_frame_color_table, classify_yarn_rows, frame_colors_for, resolve_yarn_columns
+from .fuzzy import FUZZY_MIN_SCORE, FuzzyNameMatcher, name_key
+from .join import JoinIndex
+from .loader import (PARSE_CACHE_DIR, PARSE_CACHE_MAX_ENTRIES, WorkbookCache, parse_workbook, read_workbook,
+                     read_xlsx_streaming, workbook_key)
+from .normalize import CATEGORICAL_MAX_UNIQUE_RATIO, NORMALIZE_VERSION, clean_design_name, normalize_workbook_frame
+from .perf import PERF_LOG_PATH, PerfLog, PerfTrace, current_rss
+from .plan import (DEMAND_COLUMNS, PLAN_UNITS, PlanDemand, explode_plan, parse_production_plan,
+                   read_production_plan)
+from .refresh import apply_workbook_delta, diff_workbook, patch_frame_color_table
+from .registry import DATASET_SESSION_TTL, DatasetRegistry
+from .search import WHERE_USED_COLUMNS, DesignNameIndex, ItemCodeIndex, item_code_key
+from .similar import SIMILAR_TOP_K, SimilarityIndex
+from .window import RESULT_PAGE_SIZES, ResultWindow
+from .yarn import (UNPARSED_COLUMNS, YARN_FIELD_COLUMNS, YARN_MATERIALS, parse_yarn_descriptions,
+                   unparsed_descriptions)
+
+__all__ = [
+    'BATCH_SUGGESTIONS', 'CATEGORICAL_MAX_UNIQUE_RATIO', 'COLOR_ALIASES_PATH', 'COLOR_COLUMN_KEYWORDS',
+    'COLOR_DELIMITER_PATTERN', 'DATASET_SESSION_TTL', 'DEMAND_COLUMNS', 'EXPORT_FORMATS', 'FUZZY_MIN_SCORE',
+    'PARSE_CACHE_DIR', 'PARSE_CACHE_MAX_ENTRIES', 'PERF_LOG_PATH', 'PLAN_UNITS', 'RESULT_PAGE_SIZES',
+    'SIMILAR_TOP_K', 'UNPARSED_COLUMNS', 'WHERE_USED_COLUMNS', 'YARN_FIELD_COLUMNS', 'YARN_MATERIALS',
+    'BatchLookup', 'ColorIndex', 'Dataset', 'DatasetRegistry', 'DesignNameIndex', 'ExportCache', 'FuzzyNameMatcher',
+    'ItemCodeIndex', 'JoinIndex', 'PerfLog', 'PerfTrace', 'PlanDemand', 'ResultWindow', 'SimilarityIndex',
+    'WhereUsedLookup', 'WorkbookCache', 'apply_workbook_delta', 'batch_lookup', 'build_export',
+    'build_frame_color_table', 'canonicalize_colors', 'classify_yarn_rows', 'clean_design_name', 'color_key',
+    'column_options', 'current_rss', 'diff_workbook', 'equality_mask', 'explode_plan', 'export_file_type',
+    'filter_designs', 'filter_options', 'frame_colors_for', 'item_code_key', 'load_color_aliases', 'load_dataset',
+    'name_key', 'normalize_workbook_frame', 'parse_name_list', 'parse_production_plan', 'parse_workbook',
+    'parse_yarn_descriptions', 'patch_frame_color_table', 'read_name_list', 'read_production_plan', 'read_workbook',
+    'read_xlsx_streaming', 'resolve_filter_columns', 'resolve_yarn_columns', 'run_filter', 'run_search',
+    'tokenize_colors', 'unparsed_descriptions', 'where_used_lookup', 'workbook_key', 'write_xlsx',
+]
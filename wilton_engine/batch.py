@@ -0,0 +1,113 @@
+import io
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .dataset import Dataset
+
+BATCH_SUGGESTIONS = 3
+
+def parse_name_list(text: str) -> List[str]:
+    # One name per line: design names themselves contain commas, hyphens and slashes
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def read_name_list(data: bytes, filename: str, column_name: str = 'design name') -> List[str]:
+    if Path(filename).suffix.lower() == '.csv':
+        df = pd.read_csv(io.BytesIO(data), dtype=str)
+    else:
+        df = pd.read_excel(io.BytesIO(data), dtype=str)
+    column = next((col for col in df.columns if str(col).strip().lower() == column_name), df.columns[0])
+    return [name for name in df[column].dropna().astype(str).str.strip() if name]
+
+class BatchLookup:
+    def __init__(self, report: pd.DataFrame, designs: pd.DataFrame, yarn: pd.DataFrame, bom: pd.DataFrame):
+        self.report = report
+        self.designs = designs
+        self.yarn = yarn
+        self.bom = bom
+
+    @property
+    def unmatched(self) -> pd.DataFrame:
+        return self.report[self.report['Status'] == 'not found'][['Requested Name', 'Suggestions']]
+
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        return {
+            'BOM': self.bom,
+            'Lookup_Report': self.report,
+            'Design_Details': self.designs,
+            'Yarn_Specifications': self.yarn,
+        }
+
+def batch_lookup(dataset: Dataset, names: List[str], case_sensitive: bool = False,
+                 suggestions: int = BATCH_SUGGESTIONS) -> BatchLookup:
+    requested = pd.Series([name.strip() for name in names if name and name.strip()], dtype=object)
+    keys = requested if case_sensitive else requested.str.upper()
+    # "Maisy" and "MAISY" are one design: keep the first spelling of each lookup key, in request order
+    first = ~keys.duplicated()
+    requested, keys = requested[first].reset_index(drop=True), keys[first].reset_index(drop=True)
+    name_index = dataset.name_index
+    # One hash join of every requested name against the name index, instead of a search per name
+    name_ids = name_index.exact(keys) if len(keys) else np.array([], dtype=np.int64)
+    found = name_ids[name_ids >= 0]
+    design_rows = name_index.design_rows(found, in_order=True)
+    yarn_rows = name_index.yarn_rows(found, in_order=True)
+    designs = dataset.design_df.iloc[design_rows] if len(design_rows) else dataset.design_df.iloc[:0]
+    yarn = dataset.yarn_df.iloc[yarn_rows] if len(yarn_rows) else dataset.yarn_df.iloc[:0]
+    design_counts = designs['Design Name'].astype(str).value_counts() if 'Design Name' in designs.columns else pd.Series(dtype=int)
+    yarn_counts = yarn['Design Name'].astype(str).value_counts() if 'Design Name' in yarn.columns else pd.Series(dtype=int)
+    report = pd.DataFrame({
+        'Requested Name': requested,
+        'Design Name': [name_index.names[i] if i >= 0 else '' for i in name_ids],
+    })
+    report['Design Rows'] = report['Design Name'].map(design_counts).fillna(0).astype(int)
+    report['Yarn Rows'] = report['Design Name'].map(yarn_counts).fillna(0).astype(int)
+    report['Status'] = np.select(
+        [name_ids < 0, report['Yarn Rows'] == 0, report['Design Rows'] == 0],
+        ['not found', 'no yarn rows', 'yarn only'],
+        default='matched',
+    )
+    report['Suggestions'] = [
+        ', '.join(dataset.closest_names(name, suggestions)) if i < 0 else ''
+        for name, i in zip(requested, name_ids)
+    ]
+    bom = dataset.merge(designs) if len(designs) else designs
+    return BatchLookup(report, designs, yarn, bom)
+
+class WhereUsedLookup:
+    def __init__(self, report: pd.DataFrame, where_used: pd.DataFrame, designs: pd.DataFrame):
+        self.report = report
+        self.where_used = where_used
+        self.designs = designs
+
+    @property
+    def unmatched(self) -> pd.DataFrame:
+        return self.report[self.report['Status'] == 'not found'][['Requested Code', 'Suggestions']]
+
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        return {
+            'Where_Used': self.where_used,
+            'Lookup_Report': self.report,
+            'Design_Details': self.designs,
+        }
+
+def where_used_lookup(dataset: Dataset, item_codes: List[str], prefix: bool = False,
+                      suggestions: int = BATCH_SUGGESTIONS) -> WhereUsedLookup:
+    requested = list(dict.fromkeys(code.strip() for code in item_codes if code and code.strip()))
+    index = dataset.item_code_index
+    where_used = index.where_used(requested, prefix)
+    by_code = where_used.groupby('Requested Code', sort=False)
+    report = pd.DataFrame({'Requested Code': pd.Series(requested, dtype=object)})
+    report['Item Codes'] = report['Requested Code'].map(by_code['Item Code'].nunique()).fillna(0).astype(int)
+    report['Designs'] = report['Requested Code'].map(by_code['Design Name'].nunique()).fillna(0).astype(int)
+    report['Yarn Rows'] = report['Requested Code'].map(by_code['Yarn Rows'].sum()).fillna(0).astype(int)
+    report['Status'] = np.where(report['Yarn Rows'] > 0, 'found', 'not found')
+    report['Suggestions'] = [
+        '' if found else ', '.join(index.similar(code, suggestions))
+        for code, found in zip(report['Requested Code'], report['Status'] == 'found')
+    ]
+    name_ids = dataset.name_index.exact(pd.unique(where_used['Design Name'].astype(str)))
+    design_rows = dataset.name_index.design_rows(name_ids[name_ids >= 0], in_order=True)
+    designs = dataset.design_df.iloc[design_rows] if len(design_rows) else dataset.design_df.iloc[:0]
+    return WhereUsedLookup(report, where_used, designs)
@@ -0,0 +1,190 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .batch import batch_lookup, parse_name_list, read_name_list, where_used_lookup
+from .dataset import Dataset
+from .export import EXPORT_FORMATS, build_export, export_file_type
+from .loader import WorkbookCache
+from .plan import explode_plan, parse_production_plan, read_production_plan
+
+FILTER_QUERY_KEYS = ('colors', 'match', 'construction', 'frames', 'weft_head')
+
+def load_dataset(design_path: str, yarn_path: str, case_sensitive: bool = False, streaming: bool = False,
+                 cache: Optional[WorkbookCache] = None) -> Dataset:
+    # Goes through the same parse cache as the page, so a workbook the app has already seen is not parsed again
+    cache = WorkbookCache() if cache is None else cache
+    design_df, design_key = cache.load(Path(design_path).read_bytes(), case_sensitive)
+    yarn_df, yarn_key = cache.load(Path(yarn_path).read_bytes(), case_sensitive, streaming)
+    return Dataset(design_df, yarn_df, design_key, yarn_key)
+
+def read_queries(path: str, column_name: str = 'design name') -> List[str]:
+    # One query per line, or a spreadsheet's column_name column (otherwise its first column)
+    if Path(path).suffix.lower() in ('.xlsx', '.xls', '.csv'):
+        return read_name_list(Path(path).read_bytes(), path, column_name)
+    return parse_name_list(Path(path).read_text(encoding='utf-8'))
+
+def read_filter_queries(path: str) -> List[Dict[str, object]]:
+    # One JSON object per line: {"colors": ["BLACK", "WHITE"], "match": "any", "construction": "Brussels"}
+    queries = [json.loads(line) for line in Path(path).read_text(encoding='utf-8').splitlines() if line.strip()]
+    for query in queries:
+        unknown = set(query) - set(FILTER_QUERY_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filter keys: {', '.join(sorted(unknown))}")
+    return queries
+
+def _stacked(frames: List[pd.DataFrame], labels: List[str], label_column: str) -> pd.DataFrame:
+    # Results of every query in one sheet, tagged with the query that produced them
+    tagged = [df.assign(**{label_column: label})[[label_column] + list(df.columns)]
+              for df, label in zip(frames, labels) if not df.empty]
+    return pd.concat(tagged, ignore_index=True) if tagged else pd.DataFrame(columns=[label_column])
+
+def run_search(dataset: Dataset, queries: List[str], case_sensitive: bool = False) -> Dict[str, pd.DataFrame]:
+    design_frames, yarn_frames, merged_frames, summary = [], [], [], []
+    for query in queries:
+        design_matches, yarn_matches = dataset.search(query.strip() if case_sensitive else query.strip().upper())
+        design_frames.append(design_matches)
+        yarn_frames.append(yarn_matches)
+        merged_frames.append(dataset.merge(design_matches) if not design_matches.empty else design_matches)
+        summary.append({'Query': query, 'Designs': len(design_matches), 'Yarn Rows': len(yarn_matches),
+                        'Suggestions': '' if len(design_matches) else ', '.join(dataset.closest_names(query, 3))})
+    return {
+        'Search_Summary': pd.DataFrame(summary),
+        'Complete_Specification': _stacked(merged_frames, queries, 'Query'),
+        'Design_Details': _stacked(design_frames, queries, 'Query'),
+        'Yarn_Specifications': _stacked(yarn_frames, queries, 'Query'),
+    }
+
+def run_filter(dataset: Dataset, queries: List[Dict[str, object]]) -> Dict[str, pd.DataFrame]:
+    filtered_frames, merged_frames, summary, labels = [], [], [], []
+    for query in queries:
+        colors = query.get('colors') or []
+        colors = [colors] if isinstance(colors, str) else list(colors)
+        match_all = str(query.get('match', 'all')).lower() != 'any'
+        filtered = dataset.filter(colors, match_all, construction=query.get('construction'),
+                                  frames=None if query.get('frames') is None else str(query['frames']),
+                                  weft_head=query.get('weft_head'))
+        label = json.dumps(query, ensure_ascii=False)
+        labels.append(label)
+        filtered_frames.append(filtered)
+        merged_frames.append(dataset.merge(filtered) if not filtered.empty else filtered)
+        summary.append({'Query': label, 'Designs': len(filtered)})
+    return {
+        'Filter_Summary': pd.DataFrame(summary),
+        'Filtered_Designs': _stacked(filtered_frames, labels, 'Query'),
+        'Filtered_Complete': _stacked(merged_frames, labels, 'Query'),
+    }
+
+def write_sheets(sheets: Dict[str, pd.DataFrame], output: Optional[str], export_format: Optional[str] = None) -> str:
+    # The format follows --format, else the output's extension; without an output, a short report goes to stdout
+    if output is None:
+        for sheet_name, df in sheets.items():
+            print(f"\n== {sheet_name} ({len(df):,} rows)")
+            if not df.empty:
+                print(df.head(20).to_string(index=False))
+        return '-'
+    export_format = export_format or Path(output).suffix.lstrip('.').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Cannot tell the export format from {output}; pass --format")
+    extension, _ = export_file_type(export_format, len(sheets))
+    path = Path(output)
+    if path.suffix.lstrip('.').lower() != extension:
+        # Several CSV or Parquet sheets come out as a zip of files
+        path = path.with_suffix(f".{extension}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(build_export(sheets, export_format))
+    return str(path)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m wilton_engine',
+        description="Search, filter and export the Wilton Weavers design master and yarn sheet without the web page.",
+    )
+    parser.add_argument('design', help="design master workbook (.xlsx)")
+    parser.add_argument('yarn', help="yarn specification workbook (.xlsx)")
+    parser.add_argument('--case-sensitive', action='store_true', help="match design names with their case")
+    parser.add_argument('--streaming', action='store_true', help="read the yarn sheet with the streaming reader")
+    parser.add_argument('-o', '--output', default=None,
+                        help="file to write (.xlsx, .csv, .parquet or .json); prints a summary when left out")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default=None,
+                        help="export format when the output extension does not say it")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search', help="design-name search, like the page's search box")
+    search.add_argument('queries', nargs='*', help="design names or name fragments")
+    search.add_argument('--queries-file', help="one query per line, or a spreadsheet column")
+
+    filter_parser = commands.add_parser('filter',
+                                        help="multi-filter search on colours, construction, frames, weft head")
+    filter_parser.add_argument('--color', action='append', default=[], dest='colors', help="a colour (repeatable)")
+    filter_parser.add_argument('--match', choices=['all', 'any'], default='all',
+                               help="designs need all the colours, or any one of them")
+    filter_parser.add_argument('--construction', default=None)
+    filter_parser.add_argument('--frames', default=None)
+    filter_parser.add_argument('--weft-head', default=None)
+    filter_parser.add_argument('--queries-file', help=f"JSON lines, each with any of: {', '.join(FILTER_QUERY_KEYS)}")
+
+    batch = commands.add_parser('batch', help="bill of materials for a list of design names")
+    batch.add_argument('names', nargs='*')
+    batch.add_argument('--names-file', help="one design name per line, or a spreadsheet column")
+
+    where_used = commands.add_parser('where-used', help="designs that use the given yarn item codes")
+    where_used.add_argument('codes', nargs='*')
+    where_used.add_argument('--codes-file', help="one item code per line, or a spreadsheet column")
+    where_used.add_argument('--prefix', action='store_true', help="treat each code as a prefix")
+
+    plan = commands.add_parser('plan', help="yarn demand per item code for a production plan")
+    plan.add_argument('plan_file', help="Excel/CSV plan with design and quantity columns, or text lines 'design, qty'")
+    plan.add_argument('--unit', choices=['sqm', 'pieces'], default='sqm', help="unit of quantities given without one")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        # Queries, names, codes and plans are read and checked first, so a usage error does not wait on the workbooks
+        if args.command == 'search':
+            queries = args.queries + (read_queries(args.queries_file) if args.queries_file else [])
+            if not queries:
+                parser.error("search needs at least one query")
+        elif args.command == 'filter':
+            queries = read_filter_queries(args.queries_file) if args.queries_file else []
+            if args.colors or args.construction or args.frames or args.weft_head or not queries:
+                queries.insert(0, {'colors': args.colors, 'match': args.match, 'construction': args.construction,
+                                   'frames': args.frames, 'weft_head': args.weft_head})
+        elif args.command == 'batch':
+            names = args.names + (read_queries(args.names_file) if args.names_file else [])
+        elif args.command == 'where-used':
+            codes = args.codes + (read_queries(args.codes_file, 'item code') if args.codes_file else [])
+        else:
+            path = Path(args.plan_file)
+            if path.suffix.lower() in ('.xlsx', '.xls', '.csv'):
+                production_plan = read_production_plan(path.read_bytes(), path.name, args.unit)
+            else:
+                production_plan = parse_production_plan(path.read_text(encoding='utf-8'), args.unit)
+        started = time.perf_counter()
+        dataset = load_dataset(args.design, args.yarn, args.case_sensitive, args.streaming)
+        loaded = time.perf_counter()
+        if args.command == 'search':
+            sheets = run_search(dataset, queries, args.case_sensitive)
+        elif args.command == 'filter':
+            sheets = run_filter(dataset, queries)
+        elif args.command == 'batch':
+            sheets = batch_lookup(dataset, names, args.case_sensitive).sheets()
+        elif args.command == 'where-used':
+            sheets = where_used_lookup(dataset, codes, args.prefix).sheets()
+        else:
+            sheets = explode_plan(dataset, production_plan, args.case_sensitive).sheets()
+        written = write_sheets(sheets, args.output, args.format)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    rows = ', '.join(f"{name} {len(df):,}" for name, df in sheets.items())
+    print(f"{args.command}: loaded in {loaded - started:.2f}s, done in {time.perf_counter() - loaded:.2f}s; "
+          f"{rows} rows -> {written}", file=sys.stderr)
+    return 0
@@ -0,0 +1,46 @@
+import re
+from pathlib import Path
+from typing import Dict, Union
+
+import pandas as pd
+
+COLOR_DELIMITER_PATTERN = re.compile(r'[,;/|\-+&]')
+COLOR_ALIASES_PATH = Path(__file__).with_name('color_aliases.csv')
+COLOR_KEY_PATTERN = re.compile(r'[^A-Z0-9]')
+# Leading zeros of a shade code number: "DB09" is "DB9", "ML0036" is "ML36"
+SHADE_CODE_ZEROS_PATTERN = re.compile(r'(?<=[A-Z])0+(?=\d)')
+
+def tokenize_colors(values: pd.Series) -> pd.DataFrame:
+    # The one color tokenizer: split on , ; / | - + &, trim, upper-case; the key also drops inner spaces
+    labels = values.dropna().astype(str).str.upper().str.split(COLOR_DELIMITER_PATTERN).explode().str.strip()
+    keys = labels.str.replace(' ', '', regex=False)
+    keep = ((keys.str.len() > 1) & (labels != 'NAN')).to_numpy(dtype=bool, na_value=False)
+    return pd.DataFrame({
+        'row': labels.index[keep],
+        'label': labels.to_numpy()[keep],
+        'key': keys.to_numpy()[keep],
+    })
+
+def color_key(color: str) -> str:
+    # Spelling-insensitive key: "N.DKGREY", "N DK GREY" and "ndkgrey" all become NDKGREY
+    return SHADE_CODE_ZEROS_PATTERN.sub('', COLOR_KEY_PATTERN.sub('', str(color).upper()))
+
+def load_color_aliases(path: Union[str, Path] = COLOR_ALIASES_PATH) -> Dict[str, str]:
+    # alias key -> canonical color label, from the editable alias,canonical CSV
+    if not Path(path).exists():
+        return {}
+    table = pd.read_csv(path, comment='#', dtype=str, skipinitialspace=True).dropna()
+    canonical = table['canonical'].str.strip().str.upper()
+    return {color_key(alias): label for alias, label in zip(table['alias'], canonical) if color_key(alias)}
+
+def canonicalize_colors(labels: pd.Series, aliases: Dict[str, str]) -> pd.DataFrame:
+    # Canonical (label, key) per color label; the key is what every color comparison uses
+    unique = pd.Series(labels.unique(), dtype=object)
+    keys = unique.map(color_key)
+    canonical = keys.map(aliases)
+    found = canonical.notna()
+    table = pd.DataFrame({
+        'label': unique.where(~found, canonical).to_numpy(),
+        'key': keys.where(~found, canonical.map(color_key, na_action='ignore')).to_numpy(),
+    }, index=unique.to_numpy())
+    return table.loc[labels.to_numpy()].set_axis(labels.index)
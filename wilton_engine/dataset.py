@@ -0,0 +1,201 @@
+from functools import cached_property, wraps
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .colors import load_color_aliases
+from .filters import ColorIndex, filter_designs, filter_options, resolve_filter_columns
+from .frames import build_frame_color_table, frame_colors_for, resolve_yarn_columns
+from .fuzzy import FuzzyNameMatcher
+from .join import JoinIndex
+from .loader import parse_workbook
+from .refresh import apply_workbook_delta, patch_frame_color_table, patch_yarn_fields
+from .search import DesignNameIndex, ItemCodeIndex
+from .similar import SIMILAR_TOP_K, SimilarityIndex
+from .yarn import UNPARSED_COLUMNS, parse_yarn_descriptions, unparsed_descriptions
+
+DESIGN_INDEXES = ('color_aliases', 'filter_columns', 'color_index', 'filter_options', 'similarity_index')
+YARN_INDEXES = ('yarn_fields', 'frame_colors', 'join_index', 'item_code_index')
+# The name indexes span both tables, so they are only ever handed in, never carried over
+PREBUILT_INDEXES = DESIGN_INDEXES + YARN_INDEXES + ('name_index', 'fuzzy_matcher')
+
+def _freeze(value: object) -> object:
+    # Marks every numpy array held by an index read-only, so a session cannot change an index others share
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif hasattr(value, '__dict__') and not isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        _freeze(vars(value))
+    return value
+
+def _shared_index(build):
+    @wraps(build)
+    def frozen(self):
+        return _freeze(build(self))
+    return cached_property(frozen)
+
+class Dataset:
+    # One loaded design master / yarn sheet pair; each index is built on first use and then kept
+    def __init__(self, design_df: pd.DataFrame, yarn_df: pd.DataFrame, design_key: str = '', yarn_key: str = '',
+                 **prebuilt):
+        unknown = set(prebuilt) - set(PREBUILT_INDEXES)
+        if unknown:
+            raise TypeError(f"Unknown prebuilt indexes: {', '.join(sorted(unknown))}")
+        self.design_df = design_df
+        self.yarn_df = yarn_df
+        self.design_key = design_key
+        self.yarn_key = yarn_key
+        # cached_property reads from the instance dict, so handing an index in skips its build
+        self.__dict__.update({name: _freeze(index) for name, index in prebuilt.items() if index is not None})
+
+    @classmethod
+    def from_files(cls, design_source: Union[bytes, str, Path], yarn_source: Union[bytes, str, Path],
+                   case_sensitive: bool = False, streaming: bool = False) -> 'Dataset':
+        design_df, design_key = parse_workbook(design_source, case_sensitive)
+        yarn_df, yarn_key = parse_workbook(yarn_source, case_sensitive, streaming)
+        return cls(design_df, yarn_df, design_key, yarn_key)
+
+    @property
+    def version(self) -> Tuple[str, str]:
+        return self.design_key, self.yarn_key
+
+    @cached_property
+    def filter_columns(self) -> Dict[str, object]:
+        return resolve_filter_columns(self.design_df)
+
+    @cached_property
+    def color_aliases(self) -> Dict[str, str]:
+        return load_color_aliases()
+
+    @_shared_index
+    def color_index(self) -> ColorIndex:
+        return ColorIndex.build(self.design_df, self.filter_columns['colors'], self.color_aliases)
+
+    @cached_property
+    def filter_options(self) -> Dict[str, List[str]]:
+        return filter_options(self.design_df, self.filter_columns, self.color_index)
+
+    @_shared_index
+    def similarity_index(self) -> SimilarityIndex:
+        return SimilarityIndex.build(self.design_df, self.color_index, self.filter_columns)
+
+    @cached_property
+    def yarn_fields(self) -> pd.DataFrame:
+        # Typed columns parsed from the yarn descriptions, aligned to yarn_df; empty when there is no description column
+        description = resolve_yarn_columns(self.yarn_df)['description']
+        if description is None:
+            return pd.DataFrame(index=self.yarn_df.index)
+        return parse_yarn_descriptions(self.yarn_df[description])
+
+    @cached_property
+    def frame_colors(self) -> pd.DataFrame:
+        return build_frame_color_table(self.yarn_df, self.yarn_fields if len(self.yarn_fields.columns) else None)
+
+    @_shared_index
+    def join_index(self) -> JoinIndex:
+        return JoinIndex.build(self.yarn_df)
+
+    @_shared_index
+    def item_code_index(self) -> ItemCodeIndex:
+        return ItemCodeIndex.build(self.yarn_df)
+
+    @_shared_index
+    def name_index(self) -> DesignNameIndex:
+        return DesignNameIndex.build(self.design_df, self.yarn_df)
+
+    @_shared_index
+    def fuzzy_matcher(self) -> FuzzyNameMatcher:
+        return FuzzyNameMatcher.build(self.name_index.names)
+
+    def _built(self, names: Tuple[str, ...]) -> Dict[str, object]:
+        return {name: self.__dict__[name] for name in names if name in self.__dict__}
+
+    def with_design(self, design_df: pd.DataFrame, design_key: str, **prebuilt) -> 'Dataset':
+        return Dataset(design_df, self.yarn_df, design_key, self.yarn_key, **self._built(YARN_INDEXES), **prebuilt)
+
+    def with_yarn(self, yarn_df: pd.DataFrame, yarn_key: str, **prebuilt) -> 'Dataset':
+        return Dataset(self.design_df, yarn_df, self.design_key, yarn_key, **self._built(DESIGN_INDEXES), **prebuilt)
+
+    def apply_design_update(self, new_df: pd.DataFrame, update_key: str) -> Tuple['Dataset', Dict[str, object]]:
+        patched, kept, appended, summary = apply_workbook_delta(self.design_df, new_df, ['Design Name'])
+        color_index = self.color_index.patched(kept, appended, self.filter_columns['colors'])
+        dataset = self.with_design(patched, f"{self.design_key}+{update_key[:16]}",
+                                   filter_columns=self.filter_columns, color_index=color_index)
+        return dataset, summary
+
+    def apply_yarn_update(self, new_df: pd.DataFrame, update_key: str) -> Tuple['Dataset', Dict[str, object]]:
+        key_columns = ['Design Name'] + [col for col in [resolve_yarn_columns(self.yarn_df)['item_code']] if col]
+        patched, kept, appended, summary = apply_workbook_delta(self.yarn_df, new_df, key_columns)
+        description = resolve_yarn_columns(self.yarn_df)['description']
+        if description is None:
+            yarn_fields = pd.DataFrame(index=patched.index)
+        else:
+            yarn_fields = patch_yarn_fields(self.yarn_fields, kept, parse_yarn_descriptions(appended[description]))
+        frame_colors = patch_frame_color_table(self.frame_colors, patched, summary['groups'],
+                                               yarn_fields if description is not None else None)
+        # The join and item-code postings are one sort or factorize over the sheet, so they are rebuilt on first use
+        dataset = self.with_yarn(patched, f"{self.yarn_key}+{update_key[:16]}", yarn_fields=yarn_fields,
+                                 frame_colors=frame_colors)
+        return dataset, summary
+
+    def search(self, query: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        name_ids = self.name_index.substring(query)
+        design_matches = self.design_df.iloc[self.name_index.design_rows(name_ids)] if 'Design Name' in self.design_df.columns else pd.DataFrame()
+        yarn_matches = self.yarn_df.iloc[self.name_index.yarn_rows(name_ids)] if 'Design Name' in self.yarn_df.columns else pd.DataFrame()
+        return design_matches, yarn_matches
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        return self.name_index.suggest(query, limit)
+
+    def closest_names(self, query: str, limit: int = 8) -> List[str]:
+        # Tolerates typos, missing separators and partial names, unlike the substring search
+        return [name for name, _ in self.fuzzy_matcher.match(query, limit)]
+
+    def filter(self, selected_colors: List[str], match_all: bool = False, construction: Optional[str] = None,
+               frames: Optional[str] = None, weft_head: Optional[str] = None) -> pd.DataFrame:
+        return filter_designs(self.design_df, self.color_index, self.filter_columns, selected_colors, match_all,
+                              construction=construction, frames=frames, weft_head=weft_head)
+
+    def similar(self, design_name: str, k: int = SIMILAR_TOP_K, frames: Optional[str] = None,
+                construction: Optional[str] = None, weft_head: Optional[str] = None) -> pd.DataFrame:
+        # Designs whose colours and structure resemble this one, optionally with its frames, construction or
+        # weft head swapped for another value; the design's own rows are left out
+        name_ids = self.name_index.exact([design_name])
+        rows = self.name_index.design_rows(name_ids[name_ids >= 0])
+        if not len(rows):
+            return self.design_df.iloc[:0].assign(Similarity=pd.Series(dtype=float))
+        index = self.similarity_index
+        tokens = index.query_tokens(rows[0], frames=frames, construction=construction, weft_head=weft_head)
+        similar_rows, scores = index.similar(tokens, k, exclude=rows)
+        return self.design_df.iloc[similar_rows].assign(Similarity=np.round(scores, 3))
+
+    def yarn_for(self, design_names) -> pd.DataFrame:
+        return self.join_index.yarn_for(design_names)
+
+    def where_used(self, item_codes, prefix: bool = False) -> pd.DataFrame:
+        return self.item_code_index.where_used(item_codes, prefix)
+
+    def merge(self, design_rows: pd.DataFrame) -> pd.DataFrame:
+        return self.join_index.merge(design_rows)
+
+    def unparsed_yarn(self) -> pd.DataFrame:
+        description = resolve_yarn_columns(self.yarn_df)['description']
+        if description is None:
+            return pd.DataFrame(columns=UNPARSED_COLUMNS)
+        return unparsed_descriptions(self.yarn_df[description], self.yarn_fields)
+
+    def with_yarn_fields(self, yarn_rows: pd.DataFrame) -> pd.DataFrame:
+        # Yarn rows taken from yarn_df (same index) with their parsed material, count, ply, dtex and package
+        typed = self.yarn_fields.drop(columns=['Yarn Key', 'Parsed'], errors='ignore')
+        typed = typed[[col for col in typed.columns if col not in yarn_rows.columns]]
+        return yarn_rows.join(typed.reindex(yarn_rows.index))
+
+    def frame_colors_for(self, design_names) -> Dict[str, List[str]]:
+        return frame_colors_for(self.frame_colors, design_names)
@@ -0,0 +1,103 @@
+import io
+import json
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterator, Tuple
+
+import pandas as pd
+from openpyxl import Workbook
+
+EXPORT_FORMATS = {
+    'xlsx': {'label': 'Excel (.xlsx)', 'extension': 'xlsx',
+             'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'csv': {'label': 'CSV', 'extension': 'csv', 'mime': 'text/csv'},
+    'parquet': {'label': 'Parquet', 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+    'json': {'label': 'JSON', 'extension': 'json', 'mime': 'application/json'},
+}
+EXPORT_CACHE_MAX_ENTRIES = 16
+EXPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def _sheet_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    yield tuple(str(col) for col in df.columns)
+    # Missing cells become None so they are written as empty cells, as DataFrame.to_excel does
+    values = df.astype(object).where(df.notna(), None)
+    yield from values.itertuples(index=False, name=None)
+
+def write_xlsx(sheets: Dict[str, pd.DataFrame]) -> bytes:
+    # Write-only mode streams rows straight into the sheet XML instead of keeping a cell object per value
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        worksheet = workbook.create_sheet(title=sheet_name[:31])
+        for row in _sheet_rows(df):
+            worksheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def _csv_bytes(df: pd.DataFrame) -> bytes:
+    # The byte-order mark lets Excel open the file as UTF-8
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+def _parquet_bytes(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    try:
+        df.to_parquet(buffer, index=False)
+    except (TypeError, ValueError):
+        # Merged sheets can mix numbers and text in one column; Parquet needs a single type per column
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].map(lambda value: value if pd.isna(value) else str(value))
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+def _json_bytes(sheets: Dict[str, pd.DataFrame]) -> bytes:
+    # One document keyed by sheet name, each sheet a list of row records
+    records = (f"{json.dumps(sheet_name)}:{df.to_json(orient='records', date_format='iso', force_ascii=False)}"
+               for sheet_name, df in sheets.items())
+    return ('{' + ','.join(records) + '}').encode('utf-8')
+
+def export_file_type(export_format: str, n_sheets: int) -> Tuple[str, str]:
+    # CSV and Parquet hold one table each, so multi-sheet exports ship as a zip of files
+    if export_format in ('csv', 'parquet') and n_sheets > 1:
+        return 'zip', 'application/zip'
+    spec = EXPORT_FORMATS[export_format]
+    return spec['extension'], spec['mime']
+
+def build_export(sheets: Dict[str, pd.DataFrame], export_format: str = 'xlsx') -> bytes:
+    if export_format == 'xlsx':
+        return write_xlsx(sheets)
+    if export_format == 'json':
+        return _json_bytes(sheets)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    write = _csv_bytes if export_format == 'csv' else _parquet_bytes
+    if len(sheets) == 1:
+        return write(next(iter(sheets.values())))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, df in sheets.items():
+            archive.writestr(f"{sheet_name}.{export_format}", write(df))
+    return buffer.getvalue()
+
+class ExportCache:
+    # Built export files keyed by (dataset version, query, format); downloads build them on a worker thread
+    def __init__(self, max_entries: int = EXPORT_CACHE_MAX_ENTRIES, max_bytes: int = EXPORT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            if key in self.files:
+                self.files.move_to_end(key)
+                return self.files[key]
+        data = build()
+        with self._lock:
+            self.files[key] = data
+            while len(self.files) > self.max_entries or (
+                    len(self.files) > 1 and sum(len(value) for value in self.files.values()) > self.max_bytes):
+                self.files.popitem(last=False)
+        return data
@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .colors import canonicalize_colors, color_key, load_color_aliases, tokenize_colors
+
+COLOR_COLUMN_KEYWORDS = ['color', 'colour', 'shade', 'dye']
+
+def resolve_filter_columns(df: pd.DataFrame) -> Dict[str, object]:
+    columns = {'colors': [], 'construction': None, 'frames': None, 'weft_head': None}
+    for col in df.columns:
+        name = col.lower()
+        # Numeric columns such as "No.Of Colors" hold counts, not color names
+        if any(word in name for word in COLOR_COLUMN_KEYWORDS) and not pd.api.types.is_numeric_dtype(df[col]):
+            columns['colors'].append(col)
+        if columns['construction'] is None and 'construction' in name:
+            columns['construction'] = col
+        if columns['frames'] is None and 'frame' in name:
+            columns['frames'] = col
+        if columns['weft_head'] is None and 'weft' in name and 'head' in name:
+            columns['weft_head'] = col
+    return columns
+
+class ColorIndex:
+    # Colors are canonical integer ids; each row's ids and each id's rows are kept as sorted CSR arrays
+    def __init__(self, n_rows: int, keys: List[str], labels: List[str], row_offsets: np.ndarray,
+                 row_colors: np.ndarray, aliases: Dict[str, str]):
+        self.n_rows = n_rows
+        self.keys = keys
+        self.labels = labels
+        self.color_ids = {key: i for i, key in enumerate(keys)}
+        self.row_offsets = row_offsets
+        self.row_colors = row_colors
+        self.row_color_counts = np.diff(row_offsets)
+        self.aliases = aliases
+        rows = np.repeat(np.arange(n_rows, dtype=np.int64), self.row_color_counts)
+        order = np.argsort(row_colors, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(row_colors, minlength=len(keys)))])
+        self.postings = np.split(rows[order], offsets[1:-1]) if keys else []
+
+    @classmethod
+    def from_pairs(cls, n_rows: int, rows: np.ndarray, color_ids: np.ndarray, keys: List[str], labels: List[str],
+                   aliases: Dict[str, str]) -> 'ColorIndex':
+        order = np.lexsort((color_ids, rows))
+        row_offsets = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_rows))]).astype(np.int64)
+        return cls(n_rows, keys, labels, row_offsets, color_ids[order].astype(np.int32), aliases)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, color_columns: List[str], aliases: Optional[Dict[str, str]] = None) -> 'ColorIndex':
+        aliases = load_color_aliases() if aliases is None else aliases
+        parts = [tokenize_colors(df[col].reset_index(drop=True)) for col in color_columns]
+        pairs = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame({'row': [], 'label': [], 'key': []})
+        pairs = pd.concat([pairs[['row']], canonicalize_colors(pairs['label'].astype(object), aliases)], axis=1)
+        pairs = pairs[pairs['key'] != '']
+        pairs['row'] = pairs['row'].astype(np.int64)
+        # Display the most common spelling of each color, e.g. "COTTON WHITE" rather than "COTTONWHITE"
+        labels = pairs.groupby(['key', 'label']).size().sort_values(ascending=False, kind='stable')
+        labels = labels.reset_index().drop_duplicates('key').set_index('key')['label']
+        unique_pairs = pairs.drop_duplicates(['row', 'key'])
+        color_ids, keys = pd.factorize(unique_pairs['key'], sort=True)
+        return cls.from_pairs(len(df), unique_pairs['row'].to_numpy(), color_ids, list(keys),
+                              list(labels.loc[keys]), aliases)
+
+    def patched(self, kept: np.ndarray, appended: pd.DataFrame, color_columns: List[str]) -> 'ColorIndex':
+        # kept lists the surviving old row positions in their new order; appended rows follow them
+        new_positions = np.full(self.n_rows, -1, dtype=np.int64)
+        new_positions[kept] = np.arange(len(kept))
+        added = ColorIndex.build(appended, color_columns, self.aliases)
+        old_rows = new_positions[np.repeat(np.arange(self.n_rows), self.row_color_counts)]
+        old_colors = self.row_colors[old_rows >= 0]
+        old_rows = old_rows[old_rows >= 0]
+        added_rows = np.repeat(np.arange(added.n_rows), added.row_color_counts) + len(kept)
+        # Renumber both vocabularies into one, dropping colors no surviving row uses
+        used = sorted({self.keys[i] for i in np.unique(old_colors)} | set(added.keys))
+        color_ids = {key: i for i, key in enumerate(used)}
+        old_map = np.array([color_ids.get(key, -1) for key in self.keys], dtype=np.int64)
+        added_map = np.array([color_ids[key] for key in added.keys], dtype=np.int64)
+        label_of = dict(zip(added.keys, added.labels)) | dict(zip(self.keys, self.labels))
+        return ColorIndex.from_pairs(
+            len(kept) + added.n_rows,
+            np.concatenate([old_rows, added_rows]).astype(np.int64),
+            np.concatenate([old_map[old_colors], added_map[added.row_colors]]).astype(np.int64),
+            used, [label_of[key] for key in used], self.aliases,
+        )
+
+    def color_id(self, color: str) -> int:
+        key = color_key(color)
+        key = color_key(self.aliases[key]) if key in self.aliases else key
+        return self.color_ids.get(key, -1)
+
+    def options(self) -> List[str]:
+        return sorted(set(self.labels))
+
+    def rows_any(self, color_ids: List[int]) -> np.ndarray:
+        lists = [self.postings[i] for i in color_ids if i >= 0]
+        if not lists:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(lists))
+
+    def rows_all(self, color_ids: List[int]) -> np.ndarray:
+        if not color_ids or min(color_ids) < 0:
+            return np.array([], dtype=np.int64)
+        lists = sorted((self.postings[i] for i in color_ids), key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def query(self, selected_colors: List[str], match_all: bool) -> np.ndarray:
+        color_ids = sorted({self.color_id(color) for color in selected_colors})
+        if match_all:
+            # "All Colors" is an exact match: the design uses the selected colors and nothing else
+            rows = self.rows_all(color_ids)
+            return rows[self.row_color_counts[rows] == len(color_ids)]
+        return self.rows_any(color_ids)
+
+def equality_mask(series: pd.Series, value: str) -> np.ndarray:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Resolve the value against the few categories once, then compare integer codes per row
+        categories = pd.Series(series.cat.categories, dtype=object).astype(str).str.strip()
+        wanted = np.flatnonzero(categories.to_numpy() == value)
+        return np.isin(series.cat.codes.to_numpy(), wanted)
+    return (series.astype(str).str.strip() == value).to_numpy(dtype=bool, na_value=False)
+
+def filter_designs(df: pd.DataFrame, color_index: ColorIndex, filter_columns: Dict[str, object],
+                   selected_colors: List[str], match_all: bool,
+                   construction: Optional[str] = None, frames: Optional[str] = None,
+                   weft_head: Optional[str] = None) -> pd.DataFrame:
+    mask = np.ones(len(df), dtype=bool)
+    if selected_colors:
+        color_rows = np.zeros(len(df), dtype=bool)
+        color_rows[color_index.query(selected_colors, match_all)] = True
+        mask &= color_rows
+    for role, value in (('construction', construction), ('frames', frames), ('weft_head', weft_head)):
+        col = filter_columns[role]
+        if value and value != "Any" and col:
+            mask &= equality_mask(df[col], value)
+    return df[mask].copy() if mask.any() else pd.DataFrame()
+
+def column_options(series: pd.Series) -> List[str]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # The categories already are the distinct values; drop the ones no row uses any more
+        values = pd.Series(series.cat.remove_unused_categories().cat.categories, dtype=object).astype(str)
+    else:
+        values = series.dropna().astype(str)
+    return sorted(values.str.strip().unique())
+
+def filter_options(df: pd.DataFrame, filter_columns: Dict[str, object], color_index: ColorIndex) -> Dict[str, List[str]]:
+    options = {'colors': color_index.options()}
+    for role in ('construction', 'frames', 'weft_head'):
+        col = filter_columns[role]
+        options[role] = column_options(df[col]) if col else []
+    return options
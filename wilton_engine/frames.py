@@ -0,0 +1,75 @@
+import re
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .yarn import YARN_PACKAGE_PATTERN, parse_yarn_descriptions
+
+WOOL_ITEM_CODE_PATTERN = re.compile(r'^R\s*WO', re.IGNORECASE)
+# "WOOL COTTON WHITE-DW-4.20/3-BB" -> COTTON WHITE, "DN02+DO02 DW-4.50/3-BB" -> DN02+DO02
+FRAME_COLOR_PATTERN = re.compile(r'^\s*(?:WOOL\s+)?(?P<color>.+?)[\s\-/]*\b[A-Z]{2}[\s\-]+\d', re.IGNORECASE)
+YARN_COUNT_PATTERN = re.compile(r'[\s\-]*\d[\d.]*\s*(?:NM)?\s*/.*$', re.IGNORECASE)
+
+def resolve_yarn_columns(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    columns = {'description': None, 'item_code': None, 'consumption': None}
+    for col in df.columns:
+        name = col.lower()
+        if columns['description'] is None and 'description' in name:
+            columns['description'] = col
+        if columns['item_code'] is None and 'code' in name:
+            columns['item_code'] = col
+        # Yarn weight per unit of carpet, when the sheet carries it (e.g. "Consumption (kg/sqm)")
+        if columns['consumption'] is None and ('consumption' in name or 'kg/' in name):
+            columns['consumption'] = col
+    return columns
+
+def classify_yarn_rows(yarn_df: pd.DataFrame, fields: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    columns = resolve_yarn_columns(yarn_df)
+    # Reads the typed columns of the yarn-description parser instead of running its own regexes
+    fields = parse_yarn_descriptions(yarn_df[columns['description']]) if fields is None else fields
+    is_wool = (fields['Material'] == 'WOOL').to_numpy(dtype=bool, na_value=False)
+    if columns['item_code']:
+        item_codes, item_uniques = pd.factorize(yarn_df[columns['item_code']].astype(str))
+        is_wool = is_wool | pd.Series(item_uniques, dtype=object).str.match(WOOL_ITEM_CODE_PATTERN).to_numpy(dtype=bool)[item_codes]
+    rows = pd.DataFrame({
+        'Design Name': yarn_df['Design Name'].to_numpy(),
+        'description': yarn_df[columns['description']].astype(object).fillna('').astype(str).str.strip().str.upper().to_numpy(),
+        'suffix': fields['Package'].astype(object).to_numpy(),
+        'stem': fields['Yarn Key'].to_numpy(),
+        'yarn_color': fields['Yarn Color'].to_numpy(),
+        'is_wool': is_wool,
+    }, index=yarn_df.index)
+    # A -CN cone is only a duplicate when the same yarn also appears as -BB/-BM for the design
+    packaged = rows.loc[rows['suffix'].isin(['BB', 'BM']), ['Design Name', 'stem']].drop_duplicates()
+    packaged_keys = pd.MultiIndex.from_frame(packaged)
+    row_keys = pd.MultiIndex.from_frame(rows[['Design Name', 'stem']])
+    rows['cn_duplicate'] = (rows['suffix'] == 'CN').to_numpy(dtype=bool, na_value=False) & row_keys.isin(packaged_keys)
+    return rows
+
+def build_frame_color_table(yarn_df: Optional[pd.DataFrame], fields: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    empty = pd.DataFrame(columns=['Frame', 'Frame Color', 'Yarn Description']).rename_axis('Design Name')
+    if yarn_df is None or yarn_df.empty or 'Design Name' not in yarn_df.columns:
+        return empty
+    if resolve_yarn_columns(yarn_df)['description'] is None:
+        return empty
+    rows = classify_yarn_rows(yarn_df, fields)
+    frames = rows[~rows['cn_duplicate'] & rows['is_wool'] & (rows['suffix'] == 'BB')]
+    frames = frames.drop_duplicates(['Design Name', 'description'])
+    # The parsed yarn color first; descriptions without a dye type fall back to the looser patterns
+    colors = frames['yarn_color'].fillna(frames['description'].str.extract(FRAME_COLOR_PATTERN, expand=False))
+    fallback = frames['description'].str.replace(YARN_PACKAGE_PATTERN, '', regex=True)
+    fallback = fallback.str.replace(YARN_COUNT_PATTERN, '', regex=True).str.replace(r'^WOOL\s+', '', regex=True)
+    colors = colors.fillna(fallback).str.strip(' -/').str.replace(r'\s+', ' ', regex=True)
+    table = pd.DataFrame({
+        'Design Name': frames['Design Name'].to_numpy(),
+        'Frame': frames.groupby('Design Name', sort=False).cumcount().to_numpy() + 1,
+        'Frame Color': colors.to_numpy(),
+        'Yarn Description': frames['description'].to_numpy(),
+    })
+    return table.sort_values(['Design Name', 'Frame'], kind='stable').set_index('Design Name')
+
+def frame_colors_for(frame_table: Optional[pd.DataFrame], design_names) -> Dict[str, List[str]]:
+    if frame_table is None or frame_table.empty:
+        return {}
+    found = frame_table.loc[frame_table.index.intersection(pd.Index(design_names).unique())]
+    return found.groupby(level=0, sort=False)['Frame Color'].agg(list).to_dict()
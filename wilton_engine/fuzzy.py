@@ -0,0 +1,96 @@
+import re
+import time
+from difflib import SequenceMatcher
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+NAME_KEY_PATTERN = re.compile(r'[^A-Z0-9]')
+FUZZY_CANDIDATES = 40
+FUZZY_MIN_SCORE = 0.6
+# Re-scoring stops at this budget; shortlisted names not reached by then are dropped
+FUZZY_BUDGET_SECONDS = 0.015
+# A query found inside a longer name ranks just below an equally close whole-name match
+PARTIAL_MATCH_WEIGHT = 0.9
+
+def name_key(name: str) -> str:
+    # "F17F0112 - 04" and "F17F0112-04" share the key F17F011204
+    return NAME_KEY_PATTERN.sub('', str(name).upper())
+
+def _grams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[j:j + 3] for j in range(len(padded) - 2)}
+
+def _partial_ratio(short: str, long: str) -> float:
+    # Best ratio of the short key against equally long windows of the long key, aligned on matching blocks
+    best = 0.0
+    for block in SequenceMatcher(None, short, long, autojunk=False).get_matching_blocks():
+        start = max(0, min(block.b - block.a, len(long) - len(short)))
+        best = max(best, SequenceMatcher(None, short, long[start:start + len(short)], autojunk=False).ratio())
+        if best == 1.0:
+            break
+    return best
+
+class FuzzyNameMatcher:
+    def __init__(self, keys: List[str], key_names: List[List[str]], grams: Dict[str, np.ndarray], gram_counts: np.ndarray):
+        self.keys = keys
+        self.key_names = key_names
+        self.grams = grams
+        self.gram_counts = gram_counts
+
+    @classmethod
+    def build(cls, names: List[str]) -> 'FuzzyNameMatcher':
+        key_names = {}
+        for name in names:
+            key = name_key(name)
+            if key:
+                key_names.setdefault(key, []).append(name)
+        keys = list(key_names)
+        grams = {}
+        gram_counts = np.zeros(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            key_grams = _grams(key)
+            gram_counts[i] = len(key_grams)
+            for gram in key_grams:
+                grams.setdefault(gram, []).append(i)
+        grams = {gram: np.array(ids, dtype=np.int64) for gram, ids in grams.items()}
+        return cls(keys, [key_names[key] for key in keys], grams, gram_counts)
+
+    def score(self, query_key: str, key: str) -> Tuple[float, float]:
+        # (ranking score, whole-name ratio); the second breaks ties between equally good partial matches
+        full = SequenceMatcher(None, query_key, key, autojunk=False).ratio()
+        if len(query_key) < len(key):
+            return max(full, PARTIAL_MATCH_WEIGHT * _partial_ratio(query_key, key)), full
+        return full, full
+
+    def match(self, query: str, limit: int = 8, min_score: float = FUZZY_MIN_SCORE,
+              budget: float = FUZZY_BUDGET_SECONDS) -> List[Tuple[str, float]]:
+        deadline = time.perf_counter() + budget
+        query_key = name_key(query)
+        if not query_key or not self.keys:
+            return []
+        query_grams = _grams(query_key)
+        shared = np.zeros(len(self.keys), dtype=np.int64)
+        for gram in query_grams:
+            if gram in self.grams:
+                shared[self.grams[gram]] += 1
+        candidates = np.flatnonzero(shared)
+        # Shared trigrams only shortlist, best first: close whole names (Dice) interleaved with names
+        # that contain most of the query; the edit-based score below decides the ranking
+        dice = 2 * shared[candidates] / (len(query_grams) + self.gram_counts[candidates])
+        containment = shared[candidates] / np.minimum(len(query_grams), self.gram_counts[candidates])
+        by_dice = candidates[np.argsort(-dice, kind='stable')[:FUZZY_CANDIDATES // 2]]
+        by_containment = candidates[np.argsort(-containment, kind='stable')[:FUZZY_CANDIDATES // 2]]
+        shortlist = list(dict.fromkeys(int(i) for pair in zip(by_dice, by_containment) for i in pair))
+        scored = []
+        for i in shortlist:
+            score, full = self.score(query_key, self.keys[i])
+            scored.append((-score, -full, i))
+            if time.perf_counter() > deadline:
+                break
+        matches = []
+        for negative_score, _, i in sorted(scored):
+            if -negative_score < min_score or len(matches) >= limit:
+                break
+            matches.extend((name, round(-negative_score, 3)) for name in self.key_names[i])
+        return matches[:limit]
@@ -0,0 +1,56 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+class JoinIndex:
+    def __init__(self, yarn_sorted: pd.DataFrame, ranges: Dict[str, Tuple[int, int]]):
+        self.yarn_sorted = yarn_sorted
+        self.ranges = ranges
+
+    @classmethod
+    def build(cls, yarn_df: Optional[pd.DataFrame], key: str = 'Design Name') -> 'JoinIndex':
+        if yarn_df is None or key not in yarn_df.columns:
+            return cls(pd.DataFrame(), {})
+        # Stable sort keeps each design's yarn rows in sheet order inside its range
+        yarn_sorted = yarn_df.sort_values(key, kind='stable')
+        keys = yarn_sorted[key].astype(str).to_numpy()
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else np.array([], dtype=np.int64)
+        stops = np.append(starts[1:], len(keys))
+        ranges = {keys[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+        return cls(yarn_sorted, ranges)
+
+    def positions(self, design_names) -> np.ndarray:
+        spans = [self.ranges[name] for name in pd.unique(pd.Series(design_names, dtype=object)) if name in self.ranges]
+        if not spans:
+            return np.array([], dtype=np.int64)
+        return np.concatenate([np.arange(start, stop) for start, stop in spans])
+
+    def yarn_for(self, design_names) -> pd.DataFrame:
+        # Slices come back grouped by design; sorting the original labels restores sheet order
+        return self.yarn_sorted.iloc[self.positions(design_names)].sort_index()
+
+    def merge(self, design_rows: pd.DataFrame, key: str = 'Design Name') -> pd.DataFrame:
+        # Same rows, order and columns as pd.merge(design_rows, yarn_rows, on=key, how='left')
+        names = design_rows[key].astype(str).to_numpy()
+        spans = [self.ranges.get(name, (0, 0)) for name in names]
+        counts = np.fromiter((stop - start for start, stop in spans), dtype=np.int64, count=len(spans))
+        left_positions = np.repeat(np.arange(len(design_rows)), np.maximum(counts, 1))
+        right_positions = np.full(len(left_positions), -1, dtype=np.int64)
+        offset = 0
+        for (start, stop), count in zip(spans, counts):
+            if count:
+                right_positions[offset:offset + count] = np.arange(start, stop)
+            offset += max(count, 1)
+        left = design_rows.iloc[left_positions].reset_index(drop=True)
+        right = self.yarn_sorted.drop(columns=[key]).reset_index(drop=True)
+        if (right_positions < 0).any():
+            # reindex turns the -1 placeholders into all-NaN rows, as a left merge does
+            right = right.reindex(right_positions)
+        else:
+            right = right.iloc[right_positions]
+        right = right.reset_index(drop=True)
+        overlap = set(left.columns) & set(right.columns)
+        left = left.rename(columns={col: f"{col}_x" for col in overlap})
+        right = right.rename(columns={col: f"{col}_y" for col in overlap})
+        return pd.concat([left, right], axis=1)
@@ -0,0 +1,269 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .normalize import NORMALIZE_VERSION, normalize_workbook_frame
+
+PARSE_CACHE_DIR = Path(os.environ.get('WILTON_CACHE_DIR', '.wilton_cache'))
+PARSE_CACHE_MAX_ENTRIES = 8
+
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+DIMENSION_PATTERN = re.compile(r'([A-Z]+)(\d+)$')
+
+def _column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number - 1
+
+def _first_sheet_path(archive: zipfile.ZipFile) -> str:
+    try:
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        relationships = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        rel_id = workbook.find(f'{XLSX_NS}sheets/{XLSX_NS}sheet').get(f'{XLSX_REL_NS}id')
+        for relationship in relationships:
+            if relationship.get('Id') == rel_id:
+                target = relationship.get('Target')
+                return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+    except (KeyError, AttributeError, ET.ParseError):
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+def _read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as handle:
+        for _, elem in ET.iterparse(handle):
+            if elem.tag == f'{XLSX_NS}si':
+                text = elem.find(f'{XLSX_NS}t')
+                if text is not None:
+                    strings.append(text.text or '')
+                else:
+                    strings.append(''.join(run.text or '' for run in elem.findall(f'{XLSX_NS}r/{XLSX_NS}t')))
+                elem.clear()
+    return strings
+
+def read_xlsx_streaming(data: bytes) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    started = time.perf_counter()
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        strings = _read_shared_strings(archive)
+        interned = {}
+        n_rows, n_cols = 1024, 1
+        codes = numbers = None
+        extra = {}
+        header = {}
+        header_row = None
+        last_row = -1
+        column_numbers = {}
+
+        def grow(rows: int, cols: int):
+            nonlocal codes, numbers, n_rows, n_cols
+            new_codes = np.full((rows, cols), -1, dtype=np.int32)
+            new_numbers = np.full((rows, cols), np.nan)
+            if codes is not None:
+                new_codes[:codes.shape[0], :codes.shape[1]] = codes
+                new_numbers[:numbers.shape[0], :numbers.shape[1]] = numbers
+            codes, numbers, n_rows, n_cols = new_codes, new_numbers, rows, cols
+
+        def intern(text: str) -> int:
+            if text not in interned:
+                interned[text] = len(strings)
+                strings.append(text)
+            return interned[text]
+
+        with archive.open(_first_sheet_path(archive)) as handle:
+            sheet_data = None
+            row_number = 0
+            for event, elem in ET.iterparse(handle, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{XLSX_NS}sheetData':
+                        sheet_data = elem
+                    continue
+                if elem.tag == f'{XLSX_NS}dimension':
+                    # Pre-size the column arrays from the declared sheet extent
+                    match = DIMENSION_PATTERN.search(elem.get('ref', ''))
+                    if match:
+                        grow(max(int(match.group(2)), 1), _column_number(match.group(1)) + 1)
+                    continue
+                if elem.tag != f'{XLSX_NS}row':
+                    continue
+                row_number = int(elem.get('r', row_number + 1))
+                if codes is None:
+                    grow(n_rows, n_cols)
+                position = -1
+                for cell in elem.iter(f'{XLSX_NS}c'):
+                    letters = cell.get('r', '').rstrip('0123456789')
+                    if letters:
+                        if letters not in column_numbers:
+                            column_numbers[letters] = _column_number(letters)
+                        position = column_numbers[letters]
+                    else:
+                        position += 1
+                    cell_type = cell.get('t', 'n')
+                    value_node = cell.find(f'{XLSX_NS}v')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(node.text or '' for node in cell.iter(f'{XLSX_NS}t'))
+                    elif value_node is None or value_node.text is None:
+                        continue
+                    else:
+                        value = value_node.text
+                    if header_row is None:
+                        header_row = row_number
+                    if row_number == header_row:
+                        header[position] = strings[int(value)] if cell_type == 's' else value
+                        continue
+                    row = row_number - header_row - 1
+                    if row >= n_rows or position >= n_cols:
+                        grow(max(n_rows, (row + 1) * 2) if row >= n_rows else n_rows, max(n_cols, position + 1))
+                    if cell_type == 's':
+                        codes[row, position] = int(value)
+                    elif cell_type in ('str', 'inlineStr', 'e'):
+                        codes[row, position] = intern(value)
+                    elif cell_type == 'b':
+                        extra[(row, position)] = value == '1'
+                    else:
+                        numbers[row, position] = float(value)
+                    last_row = max(last_row, row)
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+    n = last_row + 1
+    width = max([n_cols] + [position + 1 for position in header])
+    # Empty shared strings are blank cells to Excel users; pandas reads them as missing too
+    blank_codes = np.array([i for i, text in enumerate(strings) if text == ''], dtype=np.int32)
+    columns = {}
+    for j in range(width):
+        name = header.get(j)
+        name = f"Unnamed: {j}" if name is None else name
+        col_codes = codes[:n, j].copy() if codes is not None and j < codes.shape[1] else np.full(n, -1, dtype=np.int32)
+        col_codes[np.isin(col_codes, blank_codes)] = -1
+        col_numbers = numbers[:n, j] if numbers is not None and j < numbers.shape[1] else np.full(n, np.nan)
+        has_strings = (col_codes >= 0).any()
+        has_numbers = ~np.isnan(col_numbers).all()
+        col_extra = {row: value for (row, position), value in extra.items() if position == j}
+        if has_strings and not has_numbers and not col_extra:
+            used, local_codes = np.unique(col_codes[col_codes >= 0], return_inverse=True)
+            category_codes, categories = pd.factorize(pd.Index([strings[i] for i in used], dtype=object))
+            values = np.full(n, -1, dtype=np.int64)
+            values[col_codes >= 0] = category_codes[local_codes]
+            columns[name] = pd.Categorical.from_codes(values, categories=pd.Index(categories, dtype=object))
+        elif has_numbers and not has_strings and not col_extra:
+            integral = not np.isnan(col_numbers).any() and np.array_equal(col_numbers, np.round(col_numbers))
+            columns[name] = col_numbers.astype(np.int64) if integral else col_numbers
+        else:
+            values = np.full(n, np.nan, dtype=object)
+            for row in np.flatnonzero(col_codes >= 0):
+                values[row] = strings[col_codes[row]]
+            for row in np.flatnonzero(~np.isnan(col_numbers)):
+                number = col_numbers[row]
+                values[row] = int(number) if number.is_integer() else number
+            for row, value in col_extra.items():
+                values[row] = value
+            columns[name] = values
+    df = pd.DataFrame(columns)
+    seconds = time.perf_counter() - started
+    return df, {'reader': 'streaming', 'rows': n, 'seconds': seconds, 'rows_per_sec': n / seconds if seconds else 0.0}
+
+def workbook_key(data: bytes, case_sensitive: bool = False) -> str:
+    return f"{hashlib.sha256(data).hexdigest()}-n{NORMALIZE_VERSION}-{'cs' if case_sensitive else 'ci'}"
+
+def read_workbook(data: bytes, streaming: bool = False) -> Tuple[pd.DataFrame, Dict[str, object]]:
+    if streaming:
+        return read_xlsx_streaming(data)
+    started = time.perf_counter()
+    df = pd.read_excel(io.BytesIO(data))
+    seconds = time.perf_counter() - started
+    return df, {'reader': 'pandas', 'rows': len(df), 'seconds': seconds,
+                'rows_per_sec': len(df) / seconds if seconds else 0.0}
+
+def parse_workbook(source: Union[bytes, str, Path], case_sensitive: bool = False,
+                   streaming: bool = False) -> Tuple[pd.DataFrame, str]:
+    data = source if isinstance(source, bytes) else Path(source).read_bytes()
+    df, _ = read_workbook(data, streaming)
+    return normalize_workbook_frame(df, case_sensitive), workbook_key(data, case_sensitive)
+
+class WorkbookCache:
+    # Normalized workbooks by content hash: an in-memory LRU in front of Parquet copies on disk.
+    # One instance serves every session of the server, so the LRU is changed under a lock; parsing runs outside it.
+    def __init__(self, directory: Optional[Path] = PARSE_CACHE_DIR, max_entries: int = PARSE_CACHE_MAX_ENTRIES):
+        self.directory = Path(directory) if directory is not None else None
+        self.max_entries = max_entries
+        self.frames = OrderedDict()
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def parse_stats(self, key: str) -> Dict[str, object]:
+        with self._lock:
+            return self.stats.get(key, {})
+
+    def load(self, data: bytes, case_sensitive: bool = False, streaming: bool = False) -> Tuple[pd.DataFrame, str]:
+        key = workbook_key(data, case_sensitive)
+        with self._lock:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                self.stats[key] = {'reader': 'memory cache', 'rows': len(self.frames[key])}
+                return self.frames[key], key
+        path = self.directory / f"{key}.parquet" if self.directory is not None else None
+        df = None
+        if path is not None and path.exists():
+            try:
+                df = pd.read_parquet(path)
+                os.utime(path)
+                stats = {'reader': 'disk cache', 'rows': len(df)}
+            except Exception:
+                df = None
+        if df is None:
+            df, stats = read_workbook(data, streaming)
+            df = normalize_workbook_frame(df, case_sensitive)
+            if path is not None:
+                self._write_disk(df, path)
+        with self._lock:
+            self.stats[key] = stats
+            # A session that parsed the same workbook first wins, so every session shares one frame
+            df = self.frames.setdefault(key, df)
+            self.frames.move_to_end(key)
+            while len(self.frames) > self.max_entries:
+                self.frames.popitem(last=False)
+        return df, key
+
+    def _write_disk(self, df: pd.DataFrame, path: Path):
+        tmp_path = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # A temp file of its own per writer, so two sessions parsing the same upload never share one
+            with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f"{path.stem}.", suffix='.tmp',
+                                             delete=False) as tmp:
+                tmp_path = Path(tmp.name)
+                df.to_parquet(tmp, index=False)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except Exception:
+            # The on-disk copy is only an accelerator; a read-only or full disk must not block uploads
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+
+    def _prune_disk(self):
+        # Copies written under another NORMALIZE_VERSION can never be hit again
+        entries = []
+        for path in self.directory.glob('*.parquet'):
+            if f"-n{NORMALIZE_VERSION}-" in path.name:
+                entries.append(path)
+            else:
+                path.unlink(missing_ok=True)
+        entries.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in entries[self.max_entries * 2:]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+def clean_design_name(name: str) -> str:
+    if pd.isna(name):
+        return ""
+    return str(name).strip().upper()
+
+# Text columns with at most this share of distinct values are stored as pandas Categoricals
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+# Part of every parse-cache key: bump it whenever normalize_workbook_frame or the column dtypes it produces change,
+# so frames cached by an older release are parsed again instead of having the new indexes built on top of them
+NORMALIZE_VERSION = 3
+
+def normalize_workbook_frame(df: pd.DataFrame, case_sensitive: bool = False) -> pd.DataFrame:
+    df.columns = df.columns.str.strip().str.title()
+    if 'Design Name' in df.columns:
+        if isinstance(df['Design Name'].dtype, pd.CategoricalDtype):
+            df['Design Name'] = _map_categories(
+                df['Design Name'], lambda names: names.str.strip() if case_sensitive else names.str.strip().str.upper()
+            )
+        else:
+            df['Design Name'] = df['Design Name'].astype(str).str.strip()
+            if not case_sensitive:
+                df['Design Name'] = df['Design Name'].str.upper()
+    for col in df.columns[df.dtypes == object]:
+        # Mixed cells such as 2 / '2 frame' in No.Of Frames cannot be stored as one Parquet type
+        value_types = df[col].dropna().map(type).unique()
+        if len(value_types) > 1:
+            df[col] = df[col].map(lambda value: value if pd.isna(value) else str(value))
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(series):
+            continue
+        if len(series) and series.nunique() <= CATEGORICAL_MAX_UNIQUE_RATIO * len(series):
+            df[col] = series.astype('category')
+    return df
+
+def _map_categories(series: pd.Series, transform) -> pd.Series:
+    # Apply a string transform to the categories only, merging categories that become equal
+    categories = transform(pd.Series(series.cat.categories, dtype=object).astype(str))
+    category_codes, uniques = pd.factorize(categories)
+    codes = series.cat.codes.to_numpy()
+    new_codes = np.where(codes >= 0, category_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=pd.Index(uniques, dtype=object)),
+                     index=series.index, name=series.name)
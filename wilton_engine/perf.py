@@ -0,0 +1,109 @@
+import json
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from .loader import PARSE_CACHE_DIR
+
+PERF_LOG_PATH = Path(PARSE_CACHE_DIR) / 'perf.jsonl'
+PERF_LOG_MAX_BYTES = 5 * 1024 * 1024
+PERF_LOG_BACKUPS = 3
+
+def current_rss() -> Optional[int]:
+    # Resident memory of the whole process (Linux); shared by every session of the Streamlit server
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+class PerfTrace:
+    # Named, possibly nested timing spans of one rerun, with the process memory change across each span
+    def __init__(self, label: str = 'rerun'):
+        self.label = label
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.spans = []
+        self._started = time.perf_counter()
+        self._start_rss = current_rss()
+        self._depth = 0
+
+    @contextmanager
+    def span(self, name: str, **info) -> Iterator[Dict[str, object]]:
+        record = {'name': name, 'depth': self._depth, **info}
+        # Appended on entry so nested spans list after their parent
+        self.spans.append(record)
+        rss = current_rss()
+        started = time.perf_counter()
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['seconds'] = round(time.perf_counter() - started, 6)
+            end_rss = current_rss()
+            record['rss_delta'] = end_rss - rss if rss is not None and end_rss is not None else None
+
+    def record(self) -> Dict[str, object]:
+        rss = current_rss()
+        return {
+            'label': self.label,
+            'started_at': self.started_at,
+            'seconds': round(time.perf_counter() - self._started, 6),
+            'rss': rss,
+            'rss_delta': rss - self._start_rss if rss is not None and self._start_rss is not None else None,
+            'spans': self.spans,
+        }
+
+class PerfLog:
+    # Rolling JSONL file: one line per rerun, rotated to perf.jsonl.1 ... once it passes max_bytes
+    def __init__(self, path: Union[str, Path] = PERF_LOG_PATH, max_bytes: int = PERF_LOG_MAX_BYTES,
+                 backups: int = PERF_LOG_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def write(self, record: Dict[str, object]):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'a', encoding='utf-8') as log:
+                    log.write(line)
+            except OSError:
+                # Timing is best effort; a read-only disk must not break the page
+                pass
+
+    def tail(self, n: int = 20, block_size: int = 64 * 1024) -> List[Dict[str, object]]:
+        # Reads back from the end of the file only as far as the last n lines, not the whole log
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as log:
+                    position = log.seek(0, os.SEEK_END)
+                    data = b''
+                    while position > 0 and data.count(b'\n') <= n:
+                        step = min(block_size, position)
+                        position -= step
+                        log.seek(position)
+                        data = log.read(step) + data
+            except OSError:
+                return []
+        lines = data.splitlines()[-n:] if n > 0 else []
+        return [json.loads(line) for line in lines if line.strip()]
@@ -0,0 +1,141 @@
+import io
+import re
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from .dataset import Dataset
+from .frames import resolve_yarn_columns
+from .search import item_code_key
+
+PLAN_UNITS = ('sqm', 'pieces')
+PLAN_QUANTITY_KEYWORDS = ('qty', 'quantity', 'sqm', 'area', 'pieces', 'pcs')
+# "MAISEY - CAMEL<TAB>120" or "MAISEY - CAMEL, 120": the quantity is after the last separator, as names hold commas
+PLAN_LINE_PATTERN = re.compile(r'^(?P<name>.+?)\s*[\t,;]\s*(?P<quantity>[\d.,]+)\s*(?P<unit>[A-Za-z]*)\s*$')
+# Commas are only read as thousands separators, in 1,500 or lakh 1,50,000 grouping; "1,5" is refused, not read as 15
+PLAN_GROUPED_QUANTITY_PATTERN = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d{1,2}(?:,\d{2})+,\d{3}(?:\.\d+)?')
+DEMAND_COLUMNS = ['Item Code', 'Yarn Description', 'Material', 'Yarn Color', 'Unit', 'Designs', 'Planned Quantity',
+                  'Yarn Demand (kg)']
+
+def _plan_unit(text: str, default: str) -> str:
+    text = str(text).strip().lower()
+    if text.startswith(('pc', 'piece', 'nos')):
+        return 'pieces'
+    if text.startswith(('sqm', 'sq', 'm2', 'area')):
+        return 'sqm'
+    return default
+
+def _plan_quantities(quantities) -> pd.Series:
+    text = pd.Series(quantities, dtype=object).astype(str).str.strip()
+    grouped = text.str.fullmatch(PLAN_GROUPED_QUANTITY_PATTERN)
+    ambiguous = text[text.str.contains(',', regex=False) & ~grouped].unique()
+    if len(ambiguous):
+        raise ValueError(f"Quantities with a decimal comma are ambiguous: {', '.join(ambiguous[:5])}; "
+                         "write them with a decimal point (1.5)")
+    return pd.to_numeric(text.where(~grouped, text.str.replace(',', '', regex=False)), errors='coerce')
+
+def _plan_frame(names, quantities, units) -> pd.DataFrame:
+    plan = pd.DataFrame({'Design Name': pd.Series(names, dtype=object).astype(str).str.strip(),
+                         'Quantity': _plan_quantities(quantities),
+                         'Unit': pd.Series(units, dtype=object)})
+    return plan[(plan['Design Name'] != '') & plan['Quantity'].gt(0)].reset_index(drop=True)
+
+def parse_production_plan(text: str, unit: str = 'sqm') -> pd.DataFrame:
+    # One "design, quantity [unit]" per line; lines without a quantity are dropped
+    lines = [PLAN_LINE_PATTERN.match(line.strip()) for line in text.splitlines() if line.strip()]
+    lines = [line for line in lines if line]
+    return _plan_frame([line['name'] for line in lines], [line['quantity'] for line in lines],
+                       [_plan_unit(line['unit'], unit) for line in lines])
+
+def read_production_plan(data: bytes, filename: str, unit: str = 'sqm') -> pd.DataFrame:
+    if Path(filename).suffix.lower() == '.csv':
+        df = pd.read_csv(io.BytesIO(data), dtype=str)
+    else:
+        df = pd.read_excel(io.BytesIO(data), dtype=str)
+    lower = {col: str(col).strip().lower() for col in df.columns}
+    name_col = next((col for col, name in lower.items() if 'design' in name), df.columns[0])
+    quantity_col = next((col for col, name in lower.items() if col != name_col
+                         and any(keyword in name for keyword in PLAN_QUANTITY_KEYWORDS)), None)
+    if quantity_col is None:
+        raise ValueError("The plan needs a quantity column (Qty, Quantity, SQM or Pieces)")
+    unit_col = next((col for col, name in lower.items() if 'unit' in name or 'uom' in name), None)
+    # Without a unit column, a column named SQM or Pieces says the unit of every line
+    column_unit = _plan_unit(lower[quantity_col].split('(')[-1], unit)
+    units = df[unit_col].fillna('').map(lambda text: _plan_unit(text, column_unit)) if unit_col else [column_unit] * len(df)
+    return _plan_frame(df[name_col], df[quantity_col], units)
+
+class PlanDemand:
+    def __init__(self, lines: pd.DataFrame, demand: pd.DataFrame):
+        self.lines = lines
+        self.demand = demand
+
+    @property
+    def unmatched(self) -> pd.DataFrame:
+        return self.lines[self.lines['Status'] != 'matched']
+
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        return {
+            'Yarn_Demand': self.demand,
+            'Plan_Lines': self.lines,
+        }
+
+def explode_plan(dataset: Dataset, plan: pd.DataFrame, case_sensitive: bool = False) -> PlanDemand:
+    # Plan lines x design->yarn relation -> demand per item code, colour and unit, in one grouped pass.
+    # Each design counts once per item code however many frames use it; kg demand needs a consumption column.
+    name_index = dataset.name_index
+    keys = plan['Design Name'] if case_sensitive else plan['Design Name'].str.upper()
+    name_ids = name_index.exact(keys) if len(plan) else np.array([], dtype=np.int64)
+    lines = plan.assign(**{'Matched Design': [name_index.names[i] if i >= 0 else '' for i in name_ids]})
+    yarn_counts = np.where(name_ids >= 0, name_index.yarn_counts(np.maximum(name_ids, 0)), 0)
+    lines['Yarn Rows'] = yarn_counts
+    lines['Status'] = np.select([name_ids < 0, yarn_counts == 0], ['not found', 'no yarn rows'], default='matched')
+    # Repeated designs are summed first, so the explosion is per distinct design and unit, not per plan line
+    matched = pd.DataFrame({'name_id': name_ids, 'Unit': plan['Unit'].to_numpy(), 'Quantity': plan['Quantity'].to_numpy()})
+    matched = matched[matched['name_id'] >= 0].groupby(['name_id', 'Unit'], sort=False)['Quantity'].sum().reset_index()
+    rows = name_index.yarn_rows(matched['name_id'].to_numpy(), in_order=True)
+    counts = name_index.yarn_counts(matched['name_id'].to_numpy())
+    yarn_df = dataset.yarn_df
+    columns = resolve_yarn_columns(yarn_df)
+    if columns['item_code'] is None or not len(rows):
+        return PlanDemand(lines, pd.DataFrame(columns=DEMAND_COLUMNS))
+    item_codes, code_uniques = pd.factorize(yarn_df[columns['item_code']].iloc[rows], use_na_sentinel=True)
+    code_keys = np.append(pd.Series(code_uniques, dtype=object).map(item_code_key).to_numpy(dtype=object), '')
+    stocked_codes = np.append(pd.Series(code_uniques, dtype=object).astype(str).str.strip().to_numpy(dtype=object), '')
+    fields = dataset.yarn_fields.iloc[rows] if len(dataset.yarn_fields.columns) else pd.DataFrame(index=range(len(rows)))
+    exploded = pd.DataFrame({
+        'design': np.repeat(matched['name_id'].to_numpy(), counts),
+        'Item Key': code_keys[item_codes],
+        'Item Code': stocked_codes[item_codes],
+        'Yarn Description': (yarn_df[columns['description']].iloc[rows].to_numpy(dtype=object)
+                             if columns['description'] else None),
+        'Material': fields['Material'].to_numpy(dtype=object) if 'Material' in fields else None,
+        'Yarn Color': fields['Yarn Color'].to_numpy(dtype=object) if 'Yarn Color' in fields else None,
+        'Unit': np.repeat(matched['Unit'].to_numpy(), counts),
+        'Quantity': np.repeat(matched['Quantity'].to_numpy(dtype=float), counts),
+    })
+    exploded = exploded[exploded['Item Key'] != '']
+    # The item code is what is stocked; a row with a blank or variant description must not split its code's total.
+    # Spellings of one code ("R CH 000 EVA 00", "RCH000EVA00") are totalled together under the first one seen, as
+    # written in the yarn sheet, so purchasing can paste it back into their system.
+    by_key = exploded.groupby('Item Key', sort=False)
+    exploded['Item Code'] = by_key['Item Code'].transform('first')
+    exploded['Yarn Color'] = by_key['Yarn Color'].transform('first')
+    if columns['consumption']:
+        consumption = pd.to_numeric(yarn_df[columns['consumption']].iloc[rows], errors='coerce').to_numpy()
+        exploded['Yarn Demand (kg)'] = exploded['Quantity'] * consumption[exploded.index]
+    else:
+        exploded['Yarn Demand (kg)'] = np.nan
+    group = ['Item Key', 'Item Code', 'Yarn Color', 'Unit']
+    per_design = exploded.drop_duplicates(['design'] + group)
+    grouped = exploded.groupby(group, sort=False, dropna=False)
+    demand = grouped.agg(**{
+        'Yarn Description': ('Yarn Description', 'first'),
+        'Material': ('Material', 'first'),
+        'Designs': ('design', 'nunique'),
+    })
+    demand['Planned Quantity'] = per_design.groupby(group, sort=False, dropna=False)['Quantity'].sum()
+    demand['Yarn Demand (kg)'] = grouped['Yarn Demand (kg)'].sum(min_count=1)
+    demand = demand.reset_index().sort_values(['Unit', 'Planned Quantity'], ascending=[True, False], kind='stable')
+    return PlanDemand(lines, demand.reindex(columns=DEMAND_COLUMNS).reset_index(drop=True))
@@ -0,0 +1,73 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .frames import build_frame_color_table
+
+# Running row numbers such as Serial No. shift for every row after an insert, so they are left out of the row hash
+POSITION_COLUMN_PATTERN = re.compile(r'^(s|sr|sl|serial)\W*(no|num|number)\W*$', re.IGNORECASE)
+
+def _row_hashes(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    # Hash the text form of each cell so categorical and plain string versions of a sheet compare equal
+    text = pd.DataFrame({col: df[col].astype(object).where(df[col].notna(), '').astype(str) for col in columns})
+    return pd.util.hash_pandas_object(text, index=False).to_numpy()
+
+def _hashed_columns(df: pd.DataFrame) -> List[str]:
+    return [col for col in df.columns if not POSITION_COLUMN_PATTERN.match(str(col).strip())]
+
+def diff_workbook(old_df: pd.DataFrame, new_df: pd.DataFrame, key_columns: List[str],
+                  columns: Optional[List[str]] = None) -> Dict[str, object]:
+    columns = _hashed_columns(old_df) if columns is None else columns
+    old_keys, new_keys = _row_hashes(old_df, key_columns), _row_hashes(new_df, key_columns)
+    old_pairs = pd.DataFrame({'key': old_keys, 'row': _row_hashes(old_df, columns)}).value_counts()
+    new_pairs = pd.DataFrame({'key': new_keys, 'row': _row_hashes(new_df, columns)}).value_counts()
+    # A key is touched when the multiset of its full-row hashes differs between the versions
+    counts = pd.concat([old_pairs.rename('old'), new_pairs.rename('new')], axis=1).fillna(0)
+    touched = set(counts.index[counts['old'] != counts['new']].get_level_values('key'))
+    old_key_set, new_key_set = set(old_keys), set(new_keys)
+    return {
+        'old_keys': old_keys,
+        'new_keys': new_keys,
+        'touched': touched,
+        'added': len(touched - old_key_set),
+        'removed': len(touched - new_key_set),
+        'changed': len(touched & old_key_set & new_key_set),
+        'unchanged': len(old_key_set - touched),
+    }
+
+def _concat_rows(kept: pd.DataFrame, appended: pd.DataFrame) -> pd.DataFrame:
+    patched = pd.concat([kept, appended], ignore_index=True)
+    for col in kept.columns:
+        if isinstance(kept[col].dtype, pd.CategoricalDtype):
+            incoming = appended[col].astype('category')
+            patched[col] = pd.api.types.union_categoricals([kept[col].array, incoming.array], ignore_order=True)
+    return patched
+
+def apply_workbook_delta(old_df: pd.DataFrame, new_df: pd.DataFrame, key_columns: List[str],
+                         group_column: str = 'Design Name') -> Tuple[pd.DataFrame, np.ndarray, pd.DataFrame, Dict[str, object]]:
+    summary = diff_workbook(old_df, new_df, key_columns)
+    touched = np.array(sorted(summary['touched']), dtype=np.uint64)
+    # Patch whole designs so a design's rows (and so its frame order) stay in the new sheet's order
+    groups = set(old_df[group_column][np.isin(summary['old_keys'], touched)])
+    groups |= set(new_df[group_column][np.isin(summary['new_keys'], touched)])
+    kept = np.flatnonzero(~old_df[group_column].isin(groups).to_numpy())
+    appended = new_df[new_df[group_column].isin(groups).to_numpy()].reset_index(drop=True)
+    patched = _concat_rows(old_df.iloc[kept].reset_index(drop=True), appended)
+    summary['groups'] = groups
+    summary['rows_dropped'] = len(old_df) - len(kept)
+    summary['rows_added'] = len(appended)
+    return patched, kept, appended, summary
+
+def patch_yarn_fields(fields: pd.DataFrame, kept: np.ndarray, appended_fields: pd.DataFrame) -> pd.DataFrame:
+    # Parsed fields of the kept rows are reused by position; only the appended rows were parsed again
+    return _concat_rows(fields.iloc[kept].reset_index(drop=True), appended_fields.reset_index(drop=True))
+
+def patch_frame_color_table(frame_table: pd.DataFrame, yarn_df: pd.DataFrame, design_names,
+                            fields: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    design_names = pd.Index(pd.unique(pd.Series(list(design_names), dtype=object)))
+    touched = yarn_df['Design Name'].isin(design_names).to_numpy()
+    rebuilt = build_frame_color_table(yarn_df[touched], fields[touched] if fields is not None else None)
+    kept = frame_table[~frame_table.index.isin(design_names)]
+    return pd.concat([kept, rebuilt]).sort_index(kind='stable')
@@ -0,0 +1,59 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .dataset import Dataset
+
+# A session that has not rerun for this long is taken to have closed its browser tab
+DATASET_SESSION_TTL = 2 * 60 * 60
+
+class DatasetRegistry:
+    # One Dataset per content version for the whole server process, shared by every session that loaded it.
+    # Every session gets the same DataFrame objects: copy-on-write only protects frames derived from them, so
+    # assigning a column to a shared frame would change it for everyone. The page keeps no frame of its own in
+    # st.session_state and only reads dataset frames; the index arrays are read-only once built. A Dataset is
+    # never changed in place: updates make a new Dataset under a new version.
+    def __init__(self, session_ttl: float = DATASET_SESSION_TTL):
+        self.session_ttl = session_ttl
+        self.datasets = {}
+        self.holders = {}
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, session_id: str, dataset: Dataset, now: Optional[float] = None) -> Dataset:
+        # Returns the shared Dataset for this version, registering this one if it is the first
+        now = time.time() if now is None else now
+        with self._lock:
+            version = dataset.version
+            previous = self.sessions.get(session_id)
+            if previous is not None and previous[0] != version:
+                self._release(session_id, previous[0])
+            shared = self.datasets.setdefault(version, dataset)
+            self.holders.setdefault(version, set()).add(session_id)
+            self.sessions[session_id] = (version, now)
+            self._expire(now)
+            return shared
+
+    def release(self, session_id: str):
+        with self._lock:
+            previous = self.sessions.pop(session_id, None)
+            if previous is not None:
+                self._release(session_id, previous[0])
+
+    def _release(self, session_id: str, version: Tuple[str, str]):
+        holders = self.holders.get(version, set())
+        holders.discard(session_id)
+        if not holders:
+            # No session uses this version any more; dropping it frees its frames and indexes
+            self.holders.pop(version, None)
+            self.datasets.pop(version, None)
+
+    def _expire(self, now: float):
+        stale = [session_id for session_id, (_, seen) in self.sessions.items() if now - seen > self.session_ttl]
+        for session_id in stale:
+            version, _ = self.sessions.pop(session_id)
+            self._release(session_id, version)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'datasets': len(self.datasets), 'sessions': len(self.sessions)}
@@ -0,0 +1,183 @@
+import bisect
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .frames import resolve_yarn_columns
+
+# Item codes turn up with and without inner spaces ("RWOWOOL 4NM" / "RWOWOOL4NM"); spaces and case never tell
+# two codes apart
+ITEM_CODE_SPACE_PATTERN = re.compile(r'\s+')
+WHERE_USED_COLUMNS = ['Requested Code', 'Item Code', 'Design Name', 'Yarn Description', 'Yarn Rows']
+
+def item_code_key(code: str) -> str:
+    return ITEM_CODE_SPACE_PATTERN.sub('', str(code)).upper()
+
+def _row_groups_by_id(ids: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    order = np.argsort(ids, kind='stable')
+    order = order[ids[order] >= 0]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(ids[ids >= 0], minlength=n_groups))])
+    return order, offsets, ids
+
+def _row_groups(values: pd.Series, names: pd.Index) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _row_groups_by_id(names.get_indexer(values), len(names))
+
+class DesignNameIndex:
+    def __init__(self, names: List[str], grams: Dict[str, np.ndarray],
+                 design_rows: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                 yarn_rows: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        self.names = names
+        self.grams = grams
+        self._design_rows = design_rows
+        self._yarn_rows = yarn_rows
+        self._design_order, self._design_offsets, _ = design_rows
+        first_rows = np.full(len(names), np.iinfo(np.int64).max, dtype=np.int64)
+        has_rows = np.diff(self._design_offsets) > 0
+        first_rows[has_rows] = self._design_order[self._design_offsets[:-1][has_rows]]
+        self._design_first_row = first_rows
+        self._name_lookup = pd.Index(names)
+
+    @classmethod
+    def build(cls, design_df: Optional[pd.DataFrame], yarn_df: Optional[pd.DataFrame]) -> 'DesignNameIndex':
+        frames = [df['Design Name'].dropna().astype(str) for df in (design_df, yarn_df)
+                  if df is not None and 'Design Name' in df.columns]
+        names = pd.Index(sorted(set().union(*[set(values.unique()) for values in frames])))
+        grams = {}
+        for i, name in enumerate(names):
+            for gram in {name[j:j + 3] for j in range(len(name) - 2)}:
+                grams.setdefault(gram, []).append(i)
+        grams = {gram: np.array(ids, dtype=np.int64) for gram, ids in grams.items()}
+        empty = (np.array([], dtype=np.int64), np.zeros(len(names) + 1, dtype=np.int64), np.array([], dtype=np.int64))
+        def rows(df):
+            if df is None or 'Design Name' not in df.columns:
+                return empty
+            return _row_groups(df['Design Name'].astype(str), names)
+        return cls(list(names), grams, rows(design_df), rows(yarn_df))
+
+    def substring(self, query: str) -> np.ndarray:
+        if not query:
+            return np.array([], dtype=np.int64)
+        if len(query) < 3:
+            return np.array([i for i, name in enumerate(self.names) if query in name], dtype=np.int64)
+        query_grams = {query[j:j + 3] for j in range(len(query) - 2)}
+        if any(gram not in self.grams for gram in query_grams):
+            return np.array([], dtype=np.int64)
+        lists = sorted((self.grams[gram] for gram in query_grams), key=len)
+        candidates = lists[0]
+        for other in lists[1:]:
+            candidates = np.intersect1d(candidates, other, assume_unique=True)
+        # Trigrams only narrow the candidates; the order of the grams still has to be checked
+        return np.array([i for i in candidates if query in self.names[i]], dtype=np.int64)
+
+    def prefix(self, query: str) -> np.ndarray:
+        start = bisect.bisect_left(self.names, query)
+        stop = bisect.bisect_left(self.names, query + '\U0010ffff')
+        return np.arange(start, stop, dtype=np.int64)
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        ids = self.substring(query)
+        ids = ids[self._design_first_row[ids] < np.iinfo(np.int64).max]
+        ids = ids[np.argsort(self._design_first_row[ids], kind='stable')][:limit]
+        return [self.names[i] for i in ids]
+
+    def exact(self, queries) -> np.ndarray:
+        # Name ids of whole-name matches, -1 where a query is not a known name
+        # Same dtype as the names, or pandas casts the whole name index on every call instead of reusing its hash table
+        return self._name_lookup.get_indexer(pd.Index([str(query) for query in queries], dtype=self._name_lookup.dtype))
+
+    def _rows(self, groups: Tuple[np.ndarray, np.ndarray, np.ndarray], name_ids: np.ndarray,
+              in_order: bool = False) -> np.ndarray:
+        order, offsets, codes = groups
+        if len(name_ids) == 0:
+            return np.array([], dtype=np.int64)
+        if in_order:
+            # Grouped by name in the order the ids were given, sheet order within each name; the slices are
+            # stitched with one repeat instead of a concatenate over thousands of names
+            starts = offsets[name_ids]
+            counts = offsets[name_ids + 1] - starts
+            shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+            return order[np.arange(counts.sum()) + shifts]
+        if len(name_ids) > 64:
+            # Broad queries: one pass over the per-row name codes beats stitching thousands of slices
+            selected = np.zeros(len(self.names) + 1, dtype=bool)
+            selected[name_ids] = True
+            return np.flatnonzero(selected[codes])
+        rows = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in name_ids])
+        return np.sort(rows)
+
+    def yarn_counts(self, name_ids: np.ndarray) -> np.ndarray:
+        offsets = self._yarn_rows[1]
+        return offsets[name_ids + 1] - offsets[name_ids]
+
+    def design_rows(self, name_ids: np.ndarray, in_order: bool = False) -> np.ndarray:
+        return self._rows(self._design_rows, name_ids, in_order)
+
+    def yarn_rows(self, name_ids: np.ndarray, in_order: bool = False) -> np.ndarray:
+        return self._rows(self._yarn_rows, name_ids, in_order)
+
+class ItemCodeIndex:
+    # Where-used index: yarn item code -> yarn rows -> designs. Codes are kept sorted and the row ids grouped in
+    # code order, so the rows of one code, or of every code starting with a prefix, are one contiguous slice.
+    def __init__(self, yarn_df: pd.DataFrame, item_code: Optional[str], description: Optional[str], codes: np.ndarray,
+                 order: np.ndarray, offsets: np.ndarray):
+        self.yarn_df = yarn_df
+        self.item_code = item_code
+        self.description = description
+        self.codes = codes
+        self._order = order
+        self._offsets = offsets
+
+    @classmethod
+    def build(cls, yarn_df: Optional[pd.DataFrame]) -> 'ItemCodeIndex':
+        item_code = resolve_yarn_columns(yarn_df)['item_code'] if yarn_df is not None else None
+        if item_code is None or 'Design Name' not in yarn_df.columns:
+            return cls(pd.DataFrame(), None, None, np.array([], dtype=str), np.array([], dtype=np.int64),
+                       np.zeros(1, dtype=np.int64))
+        # Keys are made once per distinct code, then spread back over the rows
+        row_codes, uniques = pd.factorize(yarn_df[item_code], use_na_sentinel=True)
+        keys = pd.Series(uniques, dtype=object).map(item_code_key)
+        codes = pd.Index(sorted(set(keys) - {''}))
+        unique_ids = np.append(codes.get_indexer(keys), -1)
+        order, offsets, _ = _row_groups_by_id(unique_ids[row_codes], len(codes))
+        return cls(yarn_df, item_code, resolve_yarn_columns(yarn_df)['description'], codes.to_numpy(dtype=str),
+                   order, offsets)
+
+    def code_span(self, query: str, prefix: bool = False) -> Tuple[int, int]:
+        # Range of sorted code ids matching the query: the code itself, or every code that starts with it
+        key = item_code_key(query)
+        if not key:
+            return 0, 0
+        start = int(np.searchsorted(self.codes, key, side='left'))
+        if prefix:
+            return start, int(np.searchsorted(self.codes, key + '\U0010ffff', side='left'))
+        return start, start + int(start < len(self.codes) and self.codes[start] == key)
+
+    def rows(self, query: str, prefix: bool = False) -> np.ndarray:
+        start, stop = self.code_span(query, prefix)
+        return self._order[self._offsets[start]:self._offsets[stop]]
+
+    def complete(self, query: str, limit: int = 8) -> List[str]:
+        start, stop = self.code_span(query, prefix=True)
+        return list(self.codes[start:min(stop, start + limit)])
+
+    def similar(self, query: str, limit: int = 8) -> List[str]:
+        # Known codes sharing all but the last three characters, where mistyped colour and package letters sit
+        key = item_code_key(query)
+        return self.complete(key[:-3], limit) if len(key) > 6 else []
+
+    def where_used(self, queries, prefix: bool = False) -> pd.DataFrame:
+        # One row per requested code, matching item code and design, with how many yarn rows link them
+        queries = list(queries)
+        spans = [self.rows(query, prefix) for query in queries]
+        rows = np.concatenate(spans) if spans else np.array([], dtype=np.int64)
+        if self.item_code is None or not len(rows):
+            return pd.DataFrame(columns=WHERE_USED_COLUMNS)
+        # Only the matched rows are taken out of the yarn sheet; no column is read in full
+        columns = [self.item_code, 'Design Name'] + ([self.description] if self.description else [])
+        used = self.yarn_df[columns].iloc[rows].astype(object)
+        used.columns = WHERE_USED_COLUMNS[1:len(columns) + 1]
+        used.insert(0, 'Requested Code', np.repeat(np.array(queries, dtype=object), [len(span) for span in spans]))
+        counted = used.value_counts(sort=False, dropna=False).reset_index(name='Yarn Rows')
+        return counted.reindex(columns=WHERE_USED_COLUMNS)
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .filters import ColorIndex
+
+SIMILAR_NUM_PERM = 32
+# 16 bands of 2 rows: designs sharing half their features are almost always candidates, a fifth about half the time
+SIMILAR_BANDS = 16
+SIMILAR_TOP_K = 10
+SIMILAR_FEATURES = ('frames', 'construction', 'weft_head')
+_HASH_PRIME = (1 << 31) - 1
+
+def _gather(offsets: np.ndarray, values: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # The CSR slices of ids, back to back, and each slice's length
+    starts = offsets[ids]
+    counts = offsets[ids + 1] - starts
+    shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return values[np.arange(counts.sum()) + shifts], counts
+
+class SimilarityIndex:
+    # MinHash signatures of each design row's feature set (canonical colours, frames, construction, weft head),
+    # split into LSH bands. Rows with the same feature set share one signature, so only distinct sets are hashed.
+    def __init__(self, vocab: Dict[str, Dict[str, int]], n_tokens: int, row_sets: np.ndarray, set_offsets: np.ndarray,
+                 set_tokens: np.ndarray, hash_a: np.ndarray, hash_b: np.ndarray,
+                 bands: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]):
+        self.vocab = vocab
+        self.n_tokens = n_tokens
+        self.row_sets = row_sets
+        self.set_offsets = set_offsets
+        self.set_tokens = set_tokens
+        self.hash_a = hash_a
+        self.hash_b = hash_b
+        self.bands = bands
+        order = np.argsort(row_sets, kind='stable')
+        order = order[row_sets[order] >= 0]
+        self._set_rows = order
+        self._set_row_offsets = np.concatenate([[0], np.cumsum(np.bincount(row_sets[row_sets >= 0],
+                                                                           minlength=len(set_offsets) - 1))])
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, color_index: ColorIndex, filter_columns: Dict[str, object],
+              num_perm: int = SIMILAR_NUM_PERM, bands: int = SIMILAR_BANDS, seed: int = 1) -> 'SimilarityIndex':
+        n_rows = len(df)
+        # Token ids: colour ids first, then one id per distinct value of each structural column
+        vocab = {'colors': dict(color_index.color_ids)}
+        rows = [np.repeat(np.arange(n_rows, dtype=np.int64), color_index.row_color_counts)]
+        tokens = [color_index.row_colors.astype(np.int64)]
+        next_id = len(color_index.keys)
+        for feature in SIMILAR_FEATURES:
+            col = filter_columns.get(feature)
+            if col is None:
+                continue
+            codes, values = pd.factorize(df[col].astype(object).fillna('').astype(str).str.strip())
+            vocab[feature] = {value: next_id + i for i, value in enumerate(values) if value}
+            keep = (codes >= 0) & (values.to_numpy(dtype=object)[np.maximum(codes, 0)] != '')
+            rows.append(np.flatnonzero(keep))
+            tokens.append(codes[keep].astype(np.int64) + next_id)
+            next_id += len(values)
+        rows, tokens = np.concatenate(rows), np.concatenate(tokens)
+        order = np.lexsort((tokens, rows))
+        rows, tokens = rows[order], tokens[order]
+        row_offsets = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_rows))])
+        # Order-free 64-bit fingerprint of each row's set, so identical sets are found without building tuples
+        fingerprints = np.random.default_rng(seed).integers(1, np.iinfo(np.int64).max, size=max(next_id, 1),
+                                                            dtype=np.int64)
+        with np.errstate(over='ignore'):
+            row_keys = np.zeros(n_rows, dtype=np.uint64)
+            np.add.at(row_keys, rows, fingerprints[tokens].astype(np.uint64))
+        has_features = np.diff(row_offsets) > 0
+        set_ids, _ = pd.factorize(row_keys[has_features])
+        row_sets = np.full(n_rows, -1, dtype=np.int64)
+        row_sets[has_features] = set_ids
+        first_rows = np.flatnonzero(has_features)[np.unique(set_ids, return_index=True)[1]]
+        set_tokens, set_sizes = _gather(row_offsets, tokens, first_rows)
+        set_offsets = np.concatenate([[0], np.cumsum(set_sizes)])
+        rng = np.random.default_rng(seed + 1)
+        hash_a = rng.integers(1, _HASH_PRIME, size=num_perm, dtype=np.int64)
+        hash_b = rng.integers(0, _HASH_PRIME, size=num_perm, dtype=np.int64)
+        signatures = cls._signatures(set_tokens, set_offsets, hash_a, hash_b)
+        return cls(vocab, next_id, row_sets, set_offsets, set_tokens, hash_a, hash_b,
+                   cls._band_tables(signatures, bands))
+
+    @staticmethod
+    def _signatures(tokens: np.ndarray, offsets: np.ndarray, hash_a: np.ndarray, hash_b: np.ndarray) -> np.ndarray:
+        # Every set here is non-empty, so reduceat sees no empty slice
+        if len(offsets) < 2:
+            return np.empty((0, len(hash_a)), dtype=np.int64)
+        hashed = (tokens[:, None] * hash_a[None, :] + hash_b[None, :]) % _HASH_PRIME
+        return np.minimum.reduceat(hashed, offsets[:-1], axis=0)
+
+    @staticmethod
+    def _band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+        # One key per set and band from that band's minhashes; exact for two 31-bit values, wrapping beyond that
+        banded = signatures.reshape(len(signatures), bands, -1).astype(np.uint64)
+        keys = np.zeros(banded.shape[:2], dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for i in range(banded.shape[2]):
+                keys = keys * np.uint64(_HASH_PRIME) + banded[:, :, i]
+        return keys
+
+    @classmethod
+    def _band_tables(cls, signatures: np.ndarray, bands: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        keys = cls._band_keys(signatures, bands)
+        tables = []
+        for band in range(bands):
+            order = np.argsort(keys[:, band], kind='stable')
+            sorted_keys = keys[order, band]
+            starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])[:len(order)])
+            tables.append((sorted_keys[starts], order, np.append(starts, len(order))))
+        return tables
+
+    def row_tokens(self, row: int) -> np.ndarray:
+        set_id = self.row_sets[row]
+        if set_id < 0:
+            return np.array([], dtype=np.int64)
+        return self.set_tokens[self.set_offsets[set_id]:self.set_offsets[set_id + 1]]
+
+    def query_tokens(self, row: Optional[int] = None, **overrides: Optional[str]) -> np.ndarray:
+        # The feature set of a design row with some structural values swapped, e.g. frames='2'.
+        # A value no design has gets a fresh token: it matches nothing but still counts against every set.
+        tokens = self.row_tokens(row) if row is not None else np.array([], dtype=np.int64)
+        fresh = self.n_tokens
+        for feature, value in overrides.items():
+            if value is None or feature not in self.vocab:
+                continue
+            ids = np.fromiter(self.vocab[feature].values(), dtype=np.int64)
+            tokens = tokens[~np.isin(tokens, ids)]
+            tokens = np.append(tokens, self.vocab[feature].get(str(value).strip(), fresh))
+            fresh += 1
+        return np.unique(tokens)
+
+    def candidates(self, tokens: np.ndarray) -> np.ndarray:
+        if not len(tokens):
+            return np.array([], dtype=np.int64)
+        signature = self._signatures(tokens, np.array([0, len(tokens)]), self.hash_a, self.hash_b)
+        keys = self._band_keys(signature, len(self.bands))[0]
+        found = []
+        for (bucket_keys, order, starts), key in zip(self.bands, keys):
+            position = np.searchsorted(bucket_keys, key)
+            if position < len(bucket_keys) and bucket_keys[position] == key:
+                found.append(order[starts[position]:starts[position + 1]])
+        return np.unique(np.concatenate(found)) if found else np.array([], dtype=np.int64)
+
+    def similar(self, tokens: np.ndarray, k: int = SIMILAR_TOP_K,
+                exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # Design row positions of the k best LSH candidates by exact Jaccard similarity, with their scores
+        set_ids = self.candidates(tokens)
+        if not len(set_ids):
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        members, sizes = _gather(self.set_offsets, self.set_tokens, set_ids)
+        shared = np.add.reduceat(np.isin(members, tokens), np.concatenate([[0], np.cumsum(sizes)[:-1]]))
+        scores = shared / (sizes + len(tokens) - shared)
+        ranked = np.argsort(-scores, kind='stable')
+        # Only as many of the best sets as it takes to fill k rows, after the excluded ones, are expanded
+        set_counts = np.diff(self._set_row_offsets)[set_ids[ranked]]
+        needed = k + (len(exclude) if exclude is not None else 0)
+        ranked = ranked[:int(np.searchsorted(np.cumsum(set_counts), needed)) + 1]
+        rows, counts = _gather(self._set_row_offsets, self._set_rows, set_ids[ranked])
+        row_scores = np.repeat(scores[ranked], counts)
+        if exclude is not None and len(exclude):
+            keep = ~np.isin(rows, exclude)
+            rows, row_scores = rows[keep], row_scores[keep]
+        return rows[:k], row_scores[:k]
@@ -0,0 +1,46 @@
+import math
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+RESULT_PAGE_SIZES = (25, 50, 100, 250)
+
+class ResultWindow:
+    # One page of a result table at a time: rows are picked by position after an optional sort, columns by name
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._orders = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def n_pages(self, page_size: int) -> int:
+        return max(1, math.ceil(len(self.df) / page_size))
+
+    def order(self, sort_by: str, ascending: bool = True) -> np.ndarray:
+        key = (sort_by, ascending)
+        if key not in self._orders:
+            column = self.df[sort_by].reset_index(drop=True)
+            try:
+                ranked = column.sort_values(ascending=ascending, kind='stable', na_position='last')
+            except TypeError:
+                # Merged sheets can mix numbers and text in one column; those sort as text
+                column = column.map(lambda value: value if pd.isna(value) else str(value))
+                ranked = column.sort_values(ascending=ascending, kind='stable', na_position='last')
+            self._orders[key] = ranked.index.to_numpy()
+        return self._orders[key]
+
+    def page(self, number: int, page_size: int, sort_by: Optional[str] = None, ascending: bool = True,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        # number counts from 0; a number past the end gives the last page
+        number = min(max(number, 0), self.n_pages(page_size) - 1)
+        start = number * page_size
+        if sort_by is not None:
+            rows = self.order(sort_by, ascending)[start:start + page_size]
+        else:
+            rows = np.arange(start, min(start + page_size, len(self.df)))
+        column_positions = (self.df.columns.get_indexer(columns) if columns
+                            else np.arange(len(self.df.columns)))
+        # One take of just the visible cells instead of copying whole rows or whole columns
+        return self.df.iloc[rows, column_positions[column_positions >= 0]]
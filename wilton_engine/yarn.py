@@ -0,0 +1,127 @@
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Leading word of a description -> material; longer words first so POLYTEAL is not read as POLY
+YARN_MATERIALS = {
+    'WOOL': 'WOOL', 'JUTE': 'JUTE', 'POLYESTER': 'POLYESTER', 'POLYTEAL': 'POLYESTER', 'POLY': 'POLYESTER',
+    'POLY COTTON': 'POLYCOTTON', 'POLYCOTTON': 'POLYCOTTON',
+    'RECRON': 'POLYESTER', 'PP': 'POLYPROPYLENE', 'NYLON': 'NYLON', 'SILKENZA': 'NYLON', 'SDA': 'SDA',
+    'BONAFLAME': 'WARP', 'BONAWARP': 'WARP', 'BONACHAIN': 'WARP',
+    'CHEMICAL': 'CHEMICAL', 'THICKNER': 'CHEMICAL', 'DE-FOAMER': 'CHEMICAL', 'TP': 'CHEMICAL',
+}
+_MATERIAL_WORDS = '|'.join(sorted(map(re.escape, YARN_MATERIALS), key=len, reverse=True))
+YARN_MATERIAL_PATTERN = re.compile(rf'^(?P<material>{_MATERIAL_WORDS})(?![A-Z])')
+YARN_DYE_TYPES = ['DPP', 'DW', 'NW', 'VW', 'AY']
+# Dyed wool without a material word, e.g. "DL01-DW-4.50/3-BB", is still wool
+WOOL_DYE_TYPES = ['DW', 'NW', 'VW']
+# Jute is woven undyed, so "JUTE 8LBS/2PLY-CN" names no colour and is still complete without one
+UNDYED_MATERIALS = ['JUTE']
+# "WOOL COTTON WHITE-DW-4.20/3-BB", "SDA ML0039-AY-4.50/3-CN", "WOOL BREEZE-DW-8.33/2 X 3-BB", "DL01-DW-4.50/3-BB"
+YARN_DYED_PATTERN = re.compile(
+    rf'^(?:{_MATERIAL_WORDS})?[\s\-]*(?P<color>.*?)[\s\-]*(?<![A-Z])(?P<dye>{"|".join(YARN_DYE_TYPES)})[\s\-]+'
+    r'(?P<count>\d+(?:\.\d+)?)(?:\s*/\s*(?P<ply>\d+)(?:\s*X\s*\d+)?)?')
+# "JUTE 8LBS/2PLY-BM", "POLYESTER RAW WHITE 12S/3PLY-BM", "WOOL DN02 4.1NM3PLY ...", "WOOL N.WHITE 3.6/3 PLY ..."
+_PLY = r'(?<![\d.])(?P<count>\d+(?:\.\d*)?)\s*(?P<unit>NM|S|LBS)?\s*/?\s*(?P<ply>\d+)\s*PLY'
+YARN_PLY_PATTERN = re.compile(_PLY)
+# "1330 DTEX", "PP BEIGE WEFT-321 TEX-CN", "NYLON RAW WHITE-1200D-CN", "1400/2X2DEN", "1850 DENIER",
+# "RECRON 1300 D/7 PLY IVORY CONE"
+_LINEAR_DENSITY = (r'(?<![\d.X])(?P<value>\d+(?:\.\d+)?)(?:/\d+(?:X\d+)?)?\s*(?P<unit>DTEX|DTE$|TEX|DENIER|DEN|D)(?![A-Z])'
+                   r'(?:\s*/\s*\d+(?:\s*PLY)?)?')
+YARN_LINEAR_DENSITY_PATTERN = re.compile(_LINEAR_DENSITY)
+# Undyed yarns name their colour or shade code around the count instead of before a dye type:
+# "POLYESTER RAW WHITE 12S/3PLY", "PP BEIGE WEFT-321 TEX", "PP 220 TEX - BEIGE", "WOOL 4NM 3PLY N.DR.GREY"
+YARN_PLY_COLOR_PATTERN = re.compile(rf'^(?:{_MATERIAL_WORDS})?(?P<before>.*?){_PLY}(?P<after>.*)$')
+YARN_LINEAR_DENSITY_COLOR_PATTERN = re.compile(rf'^(?:{_MATERIAL_WORDS})?(?P<before>.*?){_LINEAR_DENSITY}(?P<after>.*)$')
+# Words that describe the yarn's use or build, not its colour
+YARN_COLOR_NOISE_PATTERN = re.compile(r'\b(?:WEFT|WARP|BCF|DYED)\b')
+# Blend notes such as "(67% NZ WL+30%BR" or "80% PES" and any package word end the colour
+YARN_COLOR_END_PATTERN = re.compile(
+    r'(?:\(|\d+(?:\.\d+)?\s*%|\b\d+(?:\.\d+)?\s*NZ|\b(?:BALE|BAL|BOBBIN|BOBIN|CONE|BB|BM|CN)\b).*$')
+# Package at the end, before any trailing note in brackets or a stray number spaced off from it
+# ("JUTE 8LBS/2PLY-CN    1"); descriptions are cut at 34 characters, so BOBBIN, HANK and BALE also turn up
+# as BOBB, BO, HAN, BAL
+YARN_PACKAGE_PATTERN = re.compile(
+    r'(?:^|[\s\-–]|(?<=\d))(?P<package>BB|BM|BEAM|CN|C|CON|CONE|BOBBIN|BOBBI|BOBB|BOBIN|BOB|BO|HANK|HAN|HK|BALE|BAL)'
+    r'\s*(?:\([^)]*\)?|\s{2,}\d+(?:\.\d+)?)?\s*$')
+YARN_PACKAGES = {'BB': 'BB', 'BM': 'BM', 'BEAM': 'BM', 'CN': 'CN', 'C': 'CN', 'CON': 'CN', 'CONE': 'CN',
+                 'BOBBIN': 'BOBBIN', 'BOBBI': 'BOBBIN', 'BOBB': 'BOBBIN', 'BOBIN': 'BOBBIN', 'BOB': 'BOBBIN',
+                 'BO': 'BOBBIN', 'HANK': 'HANK', 'HAN': 'HANK', 'HK': 'HANK', 'BALE': 'BALE', 'BAL': 'BALE'}
+DTEX_PER_UNIT = {'DTEX': 1.0, 'DTE': 1.0, 'TEX': 10.0, 'DENIER': 10 / 9, 'DEN': 10 / 9, 'D': 10 / 9}
+YARN_FIELD_COLUMNS = ['Material', 'Yarn Color', 'Dye Type', 'Count', 'Count Unit', 'Ply', 'Dtex', 'Package',
+                      'Yarn Key', 'Parsed']
+
+def _color_text(text: pd.Series, leading: str) -> pd.Series:
+    text = text.str.replace(YARN_COLOR_END_PATTERN, '', regex=True).str.replace(YARN_COLOR_NOISE_PATTERN, ' ', regex=True)
+    text = text.str.strip(' -/.').str.replace(r'\s*-\s*', '-', regex=True).str.replace(r'\s+', ' ', regex=True)
+    return text.where(text.str.contains(leading, regex=True, na=False))
+
+def _parse_unique(descriptions: pd.Series) -> pd.DataFrame:
+    material = descriptions.str.extract(YARN_MATERIAL_PATTERN, expand=False).map(YARN_MATERIALS)
+    dyed = descriptions.str.extract(YARN_DYED_PATTERN)
+    material = material.mask(material.isna() & dyed['dye'].isin(WOOL_DYE_TYPES), 'WOOL')
+    plied = descriptions.str.extract(YARN_PLY_PATTERN)
+    density = descriptions.str.extract(YARN_LINEAR_DENSITY_PATTERN)
+    package = descriptions.str.extract(YARN_PACKAGE_PATTERN, expand=False).map(YARN_PACKAGES)
+    has_dye = dyed['dye'].notna()
+    ply = pd.to_numeric(dyed['ply'], errors='coerce').where(has_dye, pd.to_numeric(plied['ply'], errors='coerce'))
+    dtex = pd.to_numeric(density['value'], errors='coerce') * density['unit'].map(DTEX_PER_UNIT)
+    count = pd.to_numeric(dyed['count'], errors='coerce').where(has_dye, pd.to_numeric(plied['count'], errors='coerce'))
+    # The package is not part of the yarn itself: the -CN cone and the -BB bobbin of one yarn share a key
+    stem = descriptions.str.replace(YARN_PACKAGE_PATTERN, '', regex=True)
+    # Dyed yarns name the colour before the dye type; the rest before the count or density, else after it
+    around = stem.str.extract(YARN_PLY_COLOR_PATTERN)[['before', 'after']]
+    around = around.fillna(stem.str.extract(YARN_LINEAR_DENSITY_COLOR_PATTERN)[['before', 'after']])
+    color = dyed['color'].str.strip(' -/').str.replace(r'\s+', ' ', regex=True).replace('', np.nan)
+    # A shade code such as 17Y125 may lead with digits; after the count, only a word is a colour, not "362 F 100TPM"
+    color = color.where(has_dye, _color_text(around['before'], r'^(?!\d+$)[A-Z0-9]')
+                        .fillna(_color_text(around['after'], r'^[A-Z]')))
+    fields = pd.DataFrame({
+        'Material': material,
+        'Yarn Color': color,
+        'Dye Type': dyed['dye'],
+        'Count': count.astype('float64'),
+        'Count Unit': plied['unit'].where(~has_dye),
+        'Ply': ply.astype('Int64'),
+        'Dtex': dtex.round(1).astype('float64'),
+        'Package': package,
+        'Yarn Key': stem.str.replace(r'[^A-Z0-9]', '', regex=True),
+    })
+    # Chemicals carry no yarn numbers; any other yarn needs a count or a linear density, a package and, unless it
+    # is undyed, its colour or code to be understood, so a description missing one is reported rather than passed
+    complete = ((color.notna() | material.isin(UNDYED_MATERIALS)) & (count.notna() | dtex.notna())
+                & package.notna())
+    fields['Parsed'] = (material.notna() & ((material == 'CHEMICAL') | complete)).to_numpy(dtype=bool)
+    return fields
+
+def parse_yarn_descriptions(descriptions: pd.Series) -> pd.DataFrame:
+    # Typed fields per yarn row, aligned to the input index; the regexes run once per distinct description
+    text = descriptions.astype(object).fillna('').astype(str).str.strip().str.upper().str.replace('–', '-', regex=False)
+    codes, uniques = pd.factorize(text)
+    fields = _parse_unique(pd.Series(uniques, dtype=object)).iloc[codes].set_axis(descriptions.index)
+    for col in ('Material', 'Dye Type', 'Count Unit', 'Package'):
+        fields[col] = fields[col].astype('category')
+    return fields
+
+# Fields every non-chemical yarn needs, as named in the unparsed report; undyed yarns need no colour
+YARN_REQUIRED_FIELDS = {'material': ['Material'], 'colour/code': ['Yarn Color'], 'count/dtex': ['Count', 'Dtex'],
+                        'package': ['Package']}
+UNPARSED_COLUMNS = ['Yarn Description', 'Missing', 'Rows']
+
+def unparsed_descriptions(descriptions: pd.Series, fields: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    # Distinct descriptions the parser could not fully read, what each is missing and how many yarn rows use it
+    fields = parse_yarn_descriptions(descriptions) if fields is None else fields
+    failed = ~fields['Parsed'].to_numpy(dtype=bool)
+    text = descriptions[failed].astype(object).fillna('').astype(str).str.strip()
+    missing = pd.Series('', index=text.index, dtype=object)
+    for name, columns in YARN_REQUIRED_FIELDS.items():
+        absent = fields.loc[failed, columns].isna().all(axis=1).to_numpy()
+        if name == 'colour/code':
+            absent = absent & ~fields.loc[failed, 'Material'].isin(UNDYED_MATERIALS).to_numpy()
+        missing = missing + np.where(absent, f"{name}, ", '')
+    report = pd.DataFrame({'Yarn Description': text, 'Missing': missing.str.rstrip(', ')})[text != '']
+    if report.empty:
+        return pd.DataFrame(columns=UNPARSED_COLUMNS)
+    return report.value_counts().rename('Rows').reset_index()[UNPARSED_COLUMNS]
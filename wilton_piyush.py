@@ -8,6 +8,11 @@ import io
 import numpy as np
 import re
 from typing import Dict, List, Tuple, Optional
+import uuid
+from wilton_engine import (EXPORT_FORMATS, RESULT_PAGE_SIZES, Dataset, DatasetRegistry, ExportCache, PerfLog,
+                           PerfTrace, ResultWindow, WorkbookCache, batch_lookup, build_export, export_file_type,
+                           explode_plan, parse_name_list, parse_production_plan, read_name_list,
+                           read_production_plan, resolve_yarn_columns, where_used_lookup, workbook_key)
 
 # --- Wilton Weavers Aviation Carpets & Fine Wool Broadloom Streamlit App ---
 
@@ -25,14 +30,24 @@ st.set_page_config(
 )
 
 # --- Session State Initialization ---
-if 'design_df' not in st.session_state:
-    st.session_state.design_df = None
-if 'yarn_df' not in st.session_state:
-    st.session_state.yarn_df = None
 if 'selected_colors' not in st.session_state:
     st.session_state.selected_colors = []
 if 'search_history' not in st.session_state:
     st.session_state.search_history = []
+if 'dataset' not in st.session_state:
+    st.session_state.dataset = None
+    st.session_state.design_upload_key = None
+    st.session_state.yarn_upload_key = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# --- Performance Instrumentation ---
+# Every rerun collects named timing spans; they go to the rolling perf log and the sidebar Performance panel
+perf = PerfTrace()
+
+@st.cache_resource
+def perf_log() -> PerfLog:
+    return PerfLog()
 
 # --- CSS Styling ---
 st.markdown("""
@@ -239,57 +254,76 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- Utility Functions ---
-def clean_design_name(name: str) -> str:
-    if pd.isna(name):
-        return ""
-    return str(name).strip().upper()
-
-def extract_colors_from_text(text: str) -> List[str]:
-    if pd.isna(text) or not text:
-        return []
-    separators = [',', ';', '/', '|', '+', '&', '-']
-    colors = [text]
-    for sep in separators:
-        new_colors = []
-        for color in colors:
-            new_colors.extend(color.split(sep))
-        colors = new_colors
-    cleaned_colors = []
-    for color in colors:
-        color = color.strip().upper()
-        if color and color != 'NAN' and len(color) > 1:
-            cleaned_colors.append(color)
-    return list(set(cleaned_colors))
-
-def get_available_colors(df: pd.DataFrame) -> List[str]:
-    if df is None or df.empty:
-        return []
-    color_columns = [col for col in df.columns if 
-                    any(word in col.lower() for word in ['color', 'colour', 'shade', 'dye', 'hue'])]
-    all_colors = set()
-    for col in color_columns:
-        for value in df[col].dropna():
-            colors = extract_colors_from_text(str(value))
-            all_colors.update(colors)
-    if not all_colors:
-        all_colors = {
-            'NAVY BLUE', 'ROYAL BLUE', 'DEEP BLUE', 'SKY BLUE', 'COBALT BLUE',
-            'BURGUNDY', 'WINE RED', 'CRIMSON', 'MAROON', 'CARDINAL RED',
-            'FOREST GREEN', 'EMERALD', 'SAGE GREEN', 'OLIVE', 'HUNTER GREEN',
-            'CHARCOAL GREY', 'SILVER GREY', 'LIGHT GREY', 'STEEL GREY', 'SLATE GREY',
-            'BEIGE', 'CREAM', 'IVORY', 'CHAMPAGNE', 'PEARL WHITE',
-            'GOLD', 'BRONZE', 'COPPER', 'AMBER', 'ANTIQUE GOLD',
-            'BLACK', 'WHITE', 'PEARL', 'PLATINUM', 'STONE GREY'
-        }
-    return sorted(list(all_colors))
-
-def create_export_excel(data_dict: Dict[str, pd.DataFrame], filename_prefix: str) -> bytes:
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        for sheet_name, df in data_dict.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-    return buffer.getvalue()
+# --- Workbook Loading ---
+@st.cache_resource
+def workbook_cache() -> WorkbookCache:
+    return WorkbookCache()
+
+def load_workbook(uploaded_file, case_sensitive: bool = False, streaming: bool = False) -> Tuple[pd.DataFrame, str]:
+    return workbook_cache().load(uploaded_file.getvalue(), case_sensitive, streaming)
+
+def workbook_parse_stats(key: str) -> Dict[str, object]:
+    return workbook_cache().parse_stats(key)
+
+@st.cache_resource
+def dataset_registry() -> DatasetRegistry:
+    # Sessions that load the same workbooks share one Dataset, its frames and its indexes
+    return DatasetRegistry()
+
+# --- Export ---
+@st.cache_resource
+def export_cache() -> ExportCache:
+    return ExportCache()
+
+def offer_download(label: str, sheets: Dict[str, pd.DataFrame], query_key: tuple, file_prefix: str, export_format: str):
+    # The file is only built when the button is clicked, then reused for the same data, query and format
+    cache = export_cache()
+    cache_key = (st.session_state.dataset.version, query_key, export_format)
+    extension, mime = export_file_type(export_format, len(sheets))
+    log = perf_log()
+    def build() -> bytes:
+        # Runs on the download thread after the rerun has finished, so it is logged as its own record
+        trace = PerfTrace('export')
+        with trace.span('export.build', format=export_format, rows=sum(len(df) for df in sheets.values())):
+            data = build_export(sheets, export_format)
+        log.write(trace.record())
+        return data
+    st.download_button(
+        label=label,
+        data=lambda: cache.get_or_build(cache_key, build),
+        file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        mime=mime,
+        on_click="ignore"
+    )
+
+# --- Display Helpers ---
+def show_dataframe(name: str, df: pd.DataFrame, **kwargs):
+    with perf.span(f"render.{name}", rows=len(df)):
+        st.dataframe(df, **kwargs)
+
+def show_results(name: str, df: pd.DataFrame, key: str, height: int = 400):
+    # Only the visible page of rows and the chosen columns go to the browser; sorting happens here, over all rows
+    window = ResultWindow(df)
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        columns = st.multiselect("Columns", options=list(df.columns), key=f"{key}_columns", placeholder="All columns")
+    with col2:
+        sort_by = st.selectbox("Sort by", options=[None] + list(df.columns), key=f"{key}_sort",
+                               format_func=lambda col: "Original order" if col is None else str(col))
+    with col3:
+        descending = st.toggle("Descending", key=f"{key}_descending", disabled=sort_by is None)
+        page_size = st.selectbox("Rows per page", options=RESULT_PAGE_SIZES, index=1, key=f"{key}_page_size")
+    n_pages = window.n_pages(page_size)
+    # A narrower result than last rerun's can leave the stored page number past the end
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = 1
+    with col4:
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+    with perf.span(f"window.{name}", rows=len(df)):
+        visible = window.page(page - 1, page_size, sort_by, not descending, columns)
+    show_dataframe(name, visible, use_container_width=True, height=height)
+    first = (page - 1) * page_size
+    st.caption(f"Rows {first + 1 if len(df) else 0:,}–{first + len(visible):,} of {len(df):,}")
 
 def display_metrics_cards(metrics: Dict[str, int]):
     cols = st.columns(len(metrics))
@@ -302,6 +336,20 @@ def display_metrics_cards(metrics: Dict[str, int]):
             </div>
             """, unsafe_allow_html=True)
 
+def display_frame_colors(frame_colors: Dict[str, List[str]], limit: int = 10):
+    if not frame_colors:
+        return
+    html = '<div class="frame-colors-display"><strong>🧵 Frame-wise Color Assignment</strong><br>'
+    for design_name, colors in list(frame_colors.items())[:limit]:
+        html += f'<div style="margin-top: 0.5rem;">{design_name} — {len(colors)} frame(s):<br>'
+        for i, color in enumerate(colors, start=1):
+            html += f'<span class="frame-color-item">Frame {i}: {color}</span>'
+        html += '</div>'
+    if len(frame_colors) > limit:
+        html += f'<div style="margin-top: 0.5rem;"><em>…and {len(frame_colors) - limit} more designs</em></div>'
+    html += '</div>'
+    st.markdown(html, unsafe_allow_html=True)
+
 # --- Header ---
 st.markdown("""
 <div class="main-header">
@@ -336,7 +384,7 @@ with st.sidebar:
         <p style="margin: 0.5rem 0;"><strong>Type:</strong><br>Private Family Business</p>
     </div>
     """, unsafe_allow_html=True)
-    if st.session_state.design_df is not None and st.session_state.yarn_df is not None:
+    if st.session_state.dataset is not None:
         st.markdown("""
         <div style="background: linear-gradient(135deg, #27ae60, #2ecc71); color: white; padding: 1.5rem; border-radius: 15px; margin-bottom: 1rem;">
             <h4 style="margin-bottom: 1rem;">📊 Database Statistics</h4>
@@ -344,10 +392,11 @@ with st.sidebar:
         """, unsafe_allow_html=True)
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Design Records", len(st.session_state.design_df), delta="Active")
+            st.metric("Design Records", len(st.session_state.dataset.design_df), delta="Active")
         with col2:
-            st.metric("Yarn Records", len(st.session_state.yarn_df), delta="Active")
-        unique_designs = st.session_state.design_df['Design Name'].nunique() if 'Design Name' in st.session_state.design_df.columns else 0
+            st.metric("Yarn Records", len(st.session_state.dataset.yarn_df), delta="Active")
+        loaded_design_df = st.session_state.dataset.design_df
+        unique_designs = loaded_design_df['Design Name'].nunique() if 'Design Name' in loaded_design_df.columns else 0
         st.metric("Unique Designs", unique_designs, delta="Available")
     if st.session_state.search_history:
         st.markdown("---")
@@ -364,8 +413,24 @@ with st.sidebar:
     st.subheader("🎯 Advanced Features")
     show_analytics = st.checkbox("📈 Analytics Dashboard", value=True)
     show_export = st.checkbox("📥 Export Options", value=True)
+    export_format = st.selectbox(
+        "📄 Export Format",
+        options=list(EXPORT_FORMATS),
+        format_func=lambda export_format: EXPORT_FORMATS[export_format]['label'],
+        help="Excel and JSON keep every sheet in one file; CSV and Parquet download one file per sheet (zipped when there are several)"
+    )
     auto_refresh = st.checkbox("🔄 Auto-refresh Results", value=False)
     case_sensitive = st.checkbox("🔤 Case Sensitive Search", value=False)
+    show_performance = st.checkbox("⏱️ Performance", value=False, help="Show where this rerun spent its time")
+    # Filled in at the end of the script, once every span of this rerun has been timed
+    performance_panel = st.empty()
+    st.markdown("---")
+    st.subheader("🔎 Where Used")
+    where_used_code = st.text_input("Yarn item code", key="where_used_code", placeholder="e.g. RWOA32450S36B",
+                                    help="Lists every design whose yarn sheet uses this item code")
+    where_used_prefix = st.checkbox("Match all codes starting with this", key="where_used_prefix")
+    # Filled in after File Processing, once this rerun's dataset is known
+    where_used_panel = st.empty()
     st.markdown("---")
     st.markdown("""
     <div style="background: linear-gradient(135deg, #e74c3c, #c0392b); color: white; padding: 1rem; border-radius: 10px; text-align: center;">
@@ -402,6 +467,22 @@ with col2:
         help="Upload your yarn specifications file containing wool grades, aviation compliance, and material properties",
         key="yarn_upload"
     )
+    yarn_reader = st.radio(
+        "Yarn sheet reader",
+        options=["Standard (pandas)", "Streaming (low memory)"],
+        horizontal=True,
+        help="The streaming reader walks the sheet XML row by row into typed columns, keeping peak memory low on large yarn sheets",
+        key="yarn_reader"
+    )
+
+with st.expander("🔄 Incremental Update — apply a newer version of a loaded workbook"):
+    st.markdown("*Rows are compared by Design Name (plus Item Code for yarn); only added, removed or changed designs are patched into the loaded data.*")
+    update_col1, update_col2 = st.columns([1, 2])
+    with update_col1:
+        update_target = st.radio("Workbook to update", options=["Design Master", "Yarn Specifications"], key="update_target")
+    with update_col2:
+        update_file = st.file_uploader("Choose updated Excel file", type=["xlsx", "xls"], key="update_upload")
+    apply_update = st.button("🔄 APPLY UPDATE", disabled=update_file is None)
 
 # --- Multi-Filter Section (Color, Construction, No. of Frames, Weft Head) ---
 st.markdown("""
@@ -419,38 +500,14 @@ available_constructions = []
 available_frames = []
 available_weft_heads = []
 
-if st.session_state.design_df is not None:
-    df = st.session_state.design_df
-    # Colors
-    color_columns = [col for col in df.columns if any(word in col.lower() for word in ['color', 'colour', 'shade', 'dye'])]
-    for col in color_columns:
-        colors_in_col = df[col].dropna().astype(str).str.split(',|;|/|\\|').explode().str.strip().str.upper().unique()
-        available_colors.extend(colors_in_col)
-    available_colors = sorted(list(set([color for color in available_colors if color and color != 'NAN'])))
-    # Construction
-    construction_col = None
-    for col in df.columns:
-        if 'construction' in col.lower():
-            construction_col = col
-            break
-    if construction_col:
-        available_constructions = sorted(df[construction_col].dropna().astype(str).str.strip().unique())
-    # No. of Frames
-    frames_col = None
-    for col in df.columns:
-        if 'frame' in col.lower():
-            frames_col = col
-            break
-    if frames_col:
-        available_frames = sorted(df[frames_col].dropna().astype(str).str.strip().unique())
-    # Weft Head
-    weft_head_col = None
-    for col in df.columns:
-        if 'weft' in col.lower() and 'head' in col.lower():
-            weft_head_col = col
-            break
-    if weft_head_col:
-        available_weft_heads = sorted(df[weft_head_col].dropna().astype(str).str.strip().unique())
+# Option lists are computed once per loaded dataset version and kept on the Dataset
+if st.session_state.dataset is not None:
+    with perf.span('options'):
+        filter_options = st.session_state.dataset.filter_options
+    available_colors = filter_options['colors']
+    available_constructions = filter_options['construction']
+    available_frames = filter_options['frames']
+    available_weft_heads = filter_options['weft_head']
 
 if not available_colors:
     available_colors = [
@@ -524,25 +581,58 @@ if selected_colors or (selected_construction and selected_construction != "Any")
 if design_file is not None and yarn_file is not None:
     try:
         with st.spinner('🔄 Processing Aviation Carpet Database...'):
-            design_df = pd.read_excel(design_file)
-            yarn_df = pd.read_excel(yarn_file)
-            st.session_state.design_df = design_df
-            st.session_state.yarn_df = yarn_df
-            design_df.columns = design_df.columns.str.strip().str.title()
-            yarn_df.columns = yarn_df.columns.str.strip().str.title()
-            if 'Design Name' in design_df.columns:
-                design_df['Design Name'] = design_df['Design Name'].astype(str).str.strip()
-                if not case_sensitive:
-                    design_df['Design Name'] = design_df['Design Name'].str.upper()
-            if 'Design Name' in yarn_df.columns:
-                yarn_df['Design Name'] = yarn_df['Design Name'].astype(str).str.strip()
-                if not case_sensitive:
-                    yarn_df['Design Name'] = yarn_df['Design Name'].str.upper()
+            with perf.span('parse.design'):
+                design_df, design_upload_key = load_workbook(design_file, case_sensitive)
+            with perf.span('parse.yarn'):
+                yarn_df, yarn_upload_key = load_workbook(yarn_file, case_sensitive, streaming=yarn_reader.startswith("Streaming"))
+            # Only a different uploaded file resets the data; incremental updates stay applied across reruns
+            dataset = st.session_state.dataset
+            if dataset is None:
+                dataset = Dataset(design_df, yarn_df, design_upload_key, yarn_upload_key)
+            else:
+                if st.session_state.yarn_upload_key != yarn_upload_key:
+                    dataset = dataset.with_yarn(yarn_df, yarn_upload_key)
+                if st.session_state.design_upload_key != design_upload_key:
+                    dataset = dataset.with_design(design_df, design_upload_key)
+            st.session_state.design_upload_key = design_upload_key
+            st.session_state.yarn_upload_key = yarn_upload_key
+            if apply_update and update_file is not None:
+                with perf.span('parse.update'):
+                    update_df, update_key = load_workbook(update_file, case_sensitive)
+                target_df = dataset.design_df if update_target == "Design Master" else dataset.yarn_df
+                update_summary = None
+                if list(update_df.columns) != list(target_df.columns):
+                    st.warning("⚠️ The updated workbook has different columns; upload it as a new file instead of an incremental update.")
+                elif update_target == "Design Master":
+                    with perf.span('update.design'):
+                        dataset, update_summary = dataset.apply_design_update(update_df, update_key)
+                else:
+                    with perf.span('update.yarn'):
+                        dataset, update_summary = dataset.apply_yarn_update(update_df, update_key)
+                if update_summary:
+                    st.success(
+                        f"🔄 {update_target} updated: {update_summary['changed']} changed, {update_summary['added']} added, "
+                        f"{update_summary['removed']} removed, {update_summary['unchanged']} unchanged keys "
+                        f"({update_summary['rows_dropped']} rows replaced by {update_summary['rows_added']})"
+                    )
+            dataset = dataset_registry().acquire(st.session_state.session_id, dataset)
+            st.session_state.dataset = dataset
+            design_df, yarn_df = dataset.design_df, dataset.yarn_df
         st.markdown("""
         <div class="success-message">
             ✅ Aviation Carpet Database Successfully Loaded! Ready for Professional Design Search.
         </div>
         """, unsafe_allow_html=True)
+        with perf.span('yarn_fields'):
+            unparsed_yarn = dataset.unparsed_yarn()
+        if not unparsed_yarn.empty:
+            with st.expander(f"⚠️ {int(unparsed_yarn['Rows'].sum()):,} yarn rows ({len(unparsed_yarn):,} distinct descriptions) could not be split into material, colour/code, count and package"):
+                show_dataframe('unparsed_yarn', unparsed_yarn, use_container_width=True, height=300)
+        yarn_stats = workbook_parse_stats(yarn_upload_key)
+        if 'rows_per_sec' in yarn_stats:
+            st.caption(f"🧶 Yarn sheet parsed with the {yarn_stats['reader']} reader: {yarn_stats['rows']:,} rows in {yarn_stats['seconds']:.2f}s ({yarn_stats['rows_per_sec']:,.0f} rows/sec)")
+        elif yarn_stats:
+            st.caption(f"🧶 Yarn sheet served from the {yarn_stats['reader']} ({yarn_stats['rows']:,} rows, no parsing needed)")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.markdown(f"""
@@ -597,20 +687,18 @@ if design_file is not None and yarn_file is not None:
                 design_input_clean = design_input.strip()
                 if not case_sensitive:
                     design_input_clean = design_input_clean.upper()
-                with st.spinner('🔍 Searching Aviation Carpet Database...'):
-                    if case_sensitive:
-                        design_matches = design_df[design_df['Design Name'].str.contains(design_input_clean, na=False)] if 'Design Name' in design_df.columns else pd.DataFrame()
-                        yarn_matches = yarn_df[yarn_df['Design Name'].str.contains(design_input_clean, na=False)] if 'Design Name' in yarn_df.columns else pd.DataFrame()
-                    else:
-                        design_matches = design_df[design_df['Design Name'].str.contains(design_input_clean, na=False, case=False)] if 'Design Name' in design_df.columns else pd.DataFrame()
-                        yarn_matches = yarn_df[yarn_df['Design Name'].str.contains(design_input_clean, na=False, case=False)] if 'Design Name' in yarn_df.columns else pd.DataFrame()
+                with st.spinner('🔍 Searching Aviation Carpet Database...'), perf.span('search'):
+                    design_matches, yarn_matches = dataset.search(design_input_clean)
                 if not design_matches.empty and not yarn_matches.empty:
                     st.markdown("""
                     <div class="success-message">
                         ✅ Perfect Match Found! Design and Yarn Specifications Located in Database
                     </div>
                     """, unsafe_allow_html=True)
-                    merged = pd.merge(design_matches, yarn_matches, on='Design Name', how='left')
+                    with perf.span('frame_colors'):
+                        display_frame_colors(dataset.frame_colors_for(design_matches['Design Name']))
+                    with perf.span('merge', rows=len(design_matches)):
+                        merged = dataset.merge(design_matches)
                     tab1, tab2, tab3, tab4 = st.tabs([
                         "📊 Complete Specification", 
                         "🎨 Design Details", 
@@ -621,25 +709,25 @@ if design_file is not None and yarn_file is not None:
                         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                         st.subheader("🔧 Complete Aviation Carpet Specification")
                         st.markdown("*Combined design and yarn specifications for aviation-grade floor coverings*")
-                        st.dataframe(merged, use_container_width=True, height=400)
+                        show_results('merged', merged, key='search_complete')
                         if show_export:
-                            buffer = io.BytesIO()
-                            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                                merged.to_excel(writer, sheet_name='Complete_Specification', index=False)
-                                design_matches.to_excel(writer, sheet_name='Design_Details', index=False)
-                                yarn_matches.to_excel(writer, sheet_name='Yarn_Specifications', index=False)
-                            st.download_button(
-                                label="📥 Download Complete Specification",
-                                data=buffer.getvalue(),
-                                file_name=f"WiltonWeavers_AviationCarpet_{design_input_clean}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            offer_download(
+                                "📥 Download Complete Specification",
+                                {
+                                    'Complete_Specification': merged,
+                                    'Design_Details': design_matches,
+                                    'Yarn_Specifications': yarn_matches,
+                                },
+                                ('search', design_input_clean),
+                                f"WiltonWeavers_AviationCarpet_{design_input_clean}",
+                                export_format
                             )
                         st.markdown('</div>', unsafe_allow_html=True)
                     with tab2:
                         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                         st.subheader("🎨 Aviation Carpet Design Details")
                         st.markdown("*Comprehensive design specifications, patterns, and aviation compliance standards*")
-                        st.dataframe(design_matches, use_container_width=True, height=400)
+                        show_results('design_matches', design_matches, key='search_designs')
                         if len(design_matches) > 0:
                             col1, col2, col3 = st.columns(3)
                             with col1:
@@ -657,7 +745,7 @@ if design_file is not None and yarn_file is not None:
                         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                         st.subheader("🧶 Fine Wool & Yarn Specifications")
                         st.markdown("*Premium yarn specifications, wool grades, and material properties for aviation use*")
-                        st.dataframe(yarn_matches, use_container_width=True, height=400)
+                        show_results('yarn_matches', dataset.with_yarn_fields(yarn_matches), key='search_yarn')
                         if len(yarn_matches) > 0:
                             col1, col2, col3 = st.columns(3)
                             with col1:
@@ -740,7 +828,7 @@ if design_file is not None and yarn_file is not None:
                     st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                     st.subheader("🎨 Aviation Carpet Design Details")
                     st.markdown("*Found in design database - yarn specifications not matched*")
-                    st.dataframe(design_matches, use_container_width=True, height=400)
+                    show_results('design_matches', design_matches, key='search_designs_only')
                     st.markdown('</div>', unsafe_allow_html=True)
                 elif not yarn_matches.empty:
                     st.markdown("""
@@ -748,10 +836,11 @@ if design_file is not None and yarn_file is not None:
                         ⚠️ Yarn Specifications Found Only - Design Details May Need Separate Lookup
                     </div>
                     """, unsafe_allow_html=True)
+                    display_frame_colors(dataset.frame_colors_for(yarn_matches['Design Name']))
                     st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                     st.subheader("🧶 Fine Wool & Yarn Specifications")
                     st.markdown("*Found in yarn database - design details not matched*")
-                    st.dataframe(yarn_matches, use_container_width=True, height=400)
+                    show_results('yarn_matches', dataset.with_yarn_fields(yarn_matches), key='search_yarn_only')
                     st.markdown('</div>', unsafe_allow_html=True)
                 else:
                     st.markdown("""
@@ -760,11 +849,8 @@ if design_file is not None and yarn_file is not None:
                     </div>
                     """, unsafe_allow_html=True)
                     if 'Design Name' in design_df.columns:
-                        search_term = design_input_clean[:3] if len(design_input_clean) >= 3 else design_input_clean
-                        if case_sensitive:
-                            partial_matches = design_df[design_df['Design Name'].str.contains(search_term, na=False)]['Design Name'].unique()[:8]
-                        else:
-                            partial_matches = design_df[design_df['Design Name'].str.contains(search_term, na=False, case=False)]['Design Name'].unique()[:8]
+                        with perf.span('suggest'):
+                            partial_matches = dataset.closest_names(design_input_clean, limit=8)
                         if len(partial_matches) > 0:
                             st.markdown("""
                             <div style="background: linear-gradient(135deg, #f39c12, #e67e22); color: white; padding: 1.5rem; border-radius: 15px; margin: 1rem 0;">
@@ -791,88 +877,216 @@ if design_file is not None and yarn_file is not None:
         </div>
         """, unsafe_allow_html=True)
 
+# --- Batch BOM Lookup ---
+if design_file is not None and yarn_file is not None and st.session_state.dataset is not None:
+    dataset = st.session_state.dataset
+    with st.expander("📋 Batch BOM Lookup — resolve a whole order list in one pass"):
+        st.markdown("*Paste one design name per line, or upload an Excel/CSV list (its Design Name column, otherwise the first column).*")
+        batch_col1, batch_col2 = st.columns([2, 1])
+        with batch_col1:
+            batch_text = st.text_area("Design names (one per line)", height=180, key="batch_names")
+        with batch_col2:
+            batch_file = st.file_uploader("Or upload an order list", type=["xlsx", "xls", "csv"], key="batch_upload")
+        if st.button("📋 LOOK UP ALL BOMs", disabled=not batch_text.strip() and batch_file is None):
+            batch_names = parse_name_list(batch_text)
+            if batch_file is not None:
+                batch_names += read_name_list(batch_file.getvalue(), batch_file.name)
+            with st.spinner(f'📋 Resolving {len(batch_names)} design names...'), perf.span('batch', names=len(batch_names)):
+                st.session_state.batch_lookup = (
+                    dataset.version, tuple(batch_names), batch_lookup(dataset, batch_names, case_sensitive)
+                )
+        batch_state = st.session_state.get('batch_lookup')
+        # A result from before a new workbook or update is dropped rather than shown against the new data
+        if batch_state is not None and batch_state[0] == dataset.version:
+            _, batch_names, batch_result = batch_state
+            status_counts = batch_result.report['Status'].value_counts()
+            display_metrics_cards({
+                "Requested": len(batch_result.report),
+                "Matched": int(status_counts.drop('not found', errors='ignore').sum()),
+                "Not Found": int(status_counts.get('not found', 0)),
+                "BOM Rows": len(batch_result.bom),
+            })
+            show_results('batch_report', batch_result.report, key='batch_report', height=300)
+            if not batch_result.unmatched.empty:
+                st.warning(f"⚠️ {len(batch_result.unmatched)} of {len(batch_result.report)} names not found; closest known names are listed under Suggestions.")
+            if show_export:
+                offer_download(
+                    "📥 Download Batch BOM",
+                    batch_result.sheets(),
+                    ('batch', batch_names, case_sensitive),
+                    "WiltonWeavers_BatchBOM",
+                    export_format
+                )
+
+    with st.expander("🔎 Batch Where-Used — every design that consumes a list of yarn item codes"):
+        st.markdown("*Paste one item code per line, or upload an Excel/CSV list (its Item Code column, otherwise the first column).*")
+        codes_col1, codes_col2 = st.columns([2, 1])
+        with codes_col1:
+            codes_text = st.text_area("Item codes (one per line)", height=180, key="where_used_codes")
+        with codes_col2:
+            codes_file = st.file_uploader("Or upload a code list", type=["xlsx", "xls", "csv"], key="where_used_upload")
+            codes_prefix = st.checkbox("Treat each line as a code prefix", key="where_used_codes_prefix")
+        if st.button("🔎 FIND DESIGNS USING THESE CODES", disabled=not codes_text.strip() and codes_file is None):
+            item_codes = parse_name_list(codes_text)
+            if codes_file is not None:
+                item_codes += read_name_list(codes_file.getvalue(), codes_file.name, 'item code')
+            with st.spinner(f'🔎 Resolving {len(item_codes)} item codes...'), perf.span('where_used.batch', codes=len(item_codes)):
+                st.session_state.where_used_lookup = (
+                    dataset.version, tuple(item_codes), codes_prefix, where_used_lookup(dataset, item_codes, codes_prefix)
+                )
+        where_used_state = st.session_state.get('where_used_lookup')
+        if where_used_state is not None and where_used_state[0] == dataset.version:
+            _, item_codes, codes_prefix_used, where_used_result = where_used_state
+            display_metrics_cards({
+                "Requested": len(where_used_result.report),
+                "Found": int((where_used_result.report['Status'] == 'found').sum()),
+                "Designs": where_used_result.where_used['Design Name'].nunique(),
+                "Yarn Rows": int(where_used_result.where_used['Yarn Rows'].sum()),
+            })
+            show_results('where_used_report', where_used_result.report, key='where_used_report', height=300)
+            if not where_used_result.unmatched.empty:
+                st.warning(f"⚠️ {len(where_used_result.unmatched)} of {len(where_used_result.report)} item codes are not on the yarn sheet; codes with the same start are listed under Suggestions.")
+            show_results('where_used', where_used_result.where_used, key='where_used_designs')
+            if show_export:
+                offer_download(
+                    "📥 Download Where-Used Report",
+                    where_used_result.sheets(),
+                    ('where_used', item_codes, codes_prefix_used),
+                    "WiltonWeavers_WhereUsed",
+                    export_format
+                )
+
+    with st.expander("🏭 Production Plan — total yarn demand per item code"):
+        st.markdown("*Paste one `design, quantity` per line (optionally followed by `sqm` or `pcs`), or upload an Excel/CSV plan with Design Name and Qty/SQM/Pieces columns.*")
+        plan_col1, plan_col2 = st.columns([2, 1])
+        with plan_col1:
+            plan_text = st.text_area("Plan lines", height=180, key="plan_lines", placeholder="MAISEY - CAMEL, 120 sqm")
+        with plan_col2:
+            plan_file = st.file_uploader("Or upload a production plan", type=["xlsx", "xls", "csv"], key="plan_upload")
+            plan_unit = st.radio("Quantities without a unit are in", options=["sqm", "pieces"], horizontal=True, key="plan_unit")
+        if st.button("🏭 EXPLODE PLAN", disabled=not plan_text.strip() and plan_file is None):
+            try:
+                plan = parse_production_plan(plan_text, plan_unit)
+                if plan_file is not None:
+                    plan = pd.concat([plan, read_production_plan(plan_file.getvalue(), plan_file.name, plan_unit)],
+                                     ignore_index=True)
+                with st.spinner(f'🏭 Exploding {len(plan):,} plan lines...'), perf.span('plan', lines=len(plan)):
+                    st.session_state.plan_demand = (
+                        dataset.version, (plan_text, workbook_key(plan_file.getvalue()) if plan_file is not None else None, plan_unit),
+                        explode_plan(dataset, plan, case_sensitive)
+                    )
+            except ValueError as e:
+                st.error(f"❌ {e}")
+        plan_state = st.session_state.get('plan_demand')
+        if plan_state is not None and plan_state[0] == dataset.version:
+            _, plan_query, plan_result = plan_state
+            display_metrics_cards({
+                "Plan Lines": len(plan_result.lines),
+                "Unmatched": len(plan_result.unmatched),
+                "Item Codes": plan_result.demand['Item Code'].nunique(),
+                "Designs": int(plan_result.lines.loc[plan_result.lines['Status'] == 'matched', 'Matched Design'].nunique()),
+            })
+            if resolve_yarn_columns(dataset.yarn_df)['consumption'] is None:
+                st.caption("ℹ️ The yarn sheet has no consumption column, so demand is shown as the planned sqm/pieces that need each item code; add a Consumption (kg/sqm) column to get kg.")
+            show_results('plan_demand', plan_result.demand, key='plan_demand')
+            if not plan_result.unmatched.empty:
+                st.warning(f"⚠️ {len(plan_result.unmatched)} of {len(plan_result.lines)} plan lines have no design or no yarn rows and are left out of the demand.")
+                show_results('plan_unmatched', plan_result.unmatched, key='plan_unmatched', height=250)
+            if show_export:
+                offer_download(
+                    "📥 Download Yarn Demand",
+                    plan_result.sheets(),
+                    ('plan',) + plan_query,
+                    "WiltonWeavers_YarnDemand",
+                    export_format
+                )
+
+    with st.expander("🧬 Similar Designs — colours and construction like a known design"):
+        st.markdown("*Enter a design name; optionally ask for the same look in another construction, frame count or weft head.*")
+        similar_col1, similar_col2, similar_col3, similar_col4, similar_col5 = st.columns([3, 1, 1, 1, 1])
+        with similar_col1:
+            similar_name = st.text_input("Design like", key="similar_name", placeholder="e.g. WILD N WOOLY GEO-SEAL GREY")
+        with similar_col2:
+            similar_construction = st.selectbox("🏗️ Construction", options=["Same"] + available_constructions, key="similar_construction")
+        with similar_col3:
+            similar_frames = st.selectbox("🖼️ No. of Frames", options=["Same"] + available_frames, key="similar_frames")
+        with similar_col4:
+            similar_weft_head = st.selectbox("🧵 Weft Head", options=["Same"] + available_weft_heads, key="similar_weft_head")
+        with similar_col5:
+            similar_k = st.number_input("Top", min_value=1, max_value=100, value=10, step=5, key="similar_k")
+        if similar_name.strip():
+            similar_query = similar_name.strip() if case_sensitive else similar_name.strip().upper()
+            with perf.span('similar', k=similar_k):
+                similar_designs = dataset.similar(
+                    similar_query, int(similar_k),
+                    frames=None if similar_frames == "Same" else similar_frames,
+                    construction=None if similar_construction == "Same" else similar_construction,
+                    weft_head=None if similar_weft_head == "Same" else similar_weft_head,
+                )
+            if not similar_designs.empty:
+                show_results('similar_designs', similar_designs, key='similar_designs', height=300)
+            elif dataset.name_index.exact([similar_query])[0] >= 0:
+                st.info("ℹ️ No other design shares enough colours or structure with this one.")
+            else:
+                closest = dataset.closest_names(similar_query, 5)
+                st.warning(f"⚠️ No design named {similar_name.strip()}." + (f" Did you mean: {', '.join(closest)}?" if closest else ""))
+
+# --- Where-Used Lookup ---
+if where_used_code.strip() and st.session_state.dataset is not None:
+    dataset = st.session_state.dataset
+    with perf.span('where_used', prefix=where_used_prefix):
+        where_used = dataset.where_used([where_used_code], where_used_prefix)
+    with where_used_panel.container():
+        if where_used.empty:
+            st.caption(f"No yarn row uses item code {where_used_code.strip()}.")
+            similar_codes = dataset.item_code_index.similar(where_used_code, 5)
+            if similar_codes:
+                st.caption("Similar codes: " + ", ".join(similar_codes))
+        else:
+            used_by = where_used.groupby(['Design Name', 'Item Code'], sort=False)['Yarn Rows'].sum().reset_index()
+            st.caption(f"{used_by['Design Name'].nunique()} designs use {used_by['Item Code'].nunique()} item code(s) "
+                       f"in {int(used_by['Yarn Rows'].sum())} yarn rows")
+            show_dataframe('where_used', used_by, hide_index=True, use_container_width=True, height=300)
+
 # --- Multi-Filter Search (Color, Construction, No. of Frames, Weft Head) ---
+filter_query = (tuple(sorted(selected_colors)), match_type, selected_construction, selected_frames, selected_weft_head)
+if color_search_button:
+    # Results stay up while paging or sorting them, until a filter changes
+    st.session_state.filter_query = filter_query
 if (
     selected_colors or 
     (selected_construction and selected_construction != "Any") or 
     (selected_frames and selected_frames != "Any") or
     (selected_weft_head and selected_weft_head != "Any")
-) and (color_search_button or auto_refresh):
-    if st.session_state.design_df is not None:
-        df = st.session_state.design_df
+) and (color_search_button or auto_refresh or st.session_state.get('filter_query') == filter_query):
+    if st.session_state.dataset is not None:
+        dataset = st.session_state.dataset
         with st.spinner('🎨 Searching designs by selected filters...'):
-            # Prepare color columns
-            color_columns = [col for col in df.columns if any(word in col.lower() for word in ['color', 'colour', 'shade', 'dye'])]
-            construction_col = None
-            for col in df.columns:
-                if 'construction' in col.lower():
-                    construction_col = col
-                    break
-            frames_col = None
-            for col in df.columns:
-                if 'frame' in col.lower():
-                    frames_col = col
-                    break
-            weft_head_col = None
-            for col in df.columns:
-                if 'weft' in col.lower() and 'head' in col.lower():
-                    weft_head_col = col
-                    break
-
-            matches = []
-            for idx, row in df.iterrows():
-                # --- Color Matching ---
-                row_colors = []
-                for col in color_columns:
-                    if pd.notna(row[col]):
-                        text = str(row[col]).upper()
-                        for delimiter in [',', ';', '/', '|', '-', '+', '&']:
-                            text = text.replace(delimiter, ',')
-                        color_parts = [c.strip().replace(' ', '') for c in text.split(',') if c.strip()]
-                        row_colors.extend([c for c in color_parts if len(c) > 1])
-                row_colors = list(set(row_colors))
-                color_pass = True
-                if selected_colors:
-                    if match_type == "All Colors (AND)":
-                        normalized_row_colors = sorted([c.upper() for c in row_colors])
-                        normalized_selected_colors = sorted([c.upper().replace(' ', '') for c in selected_colors])
-                        color_pass = normalized_row_colors == normalized_selected_colors
-                    else:
-                        color_pass = any(selected_color.replace(' ', '').upper() in [c.upper() for c in row_colors] for selected_color in selected_colors)
-                # --- Construction Matching ---
-                construction_pass = True
-                if selected_construction and selected_construction != "Any" and construction_col:
-                    construction_pass = str(row[construction_col]).strip() == selected_construction
-                # --- Frames Matching ---
-                frames_pass = True
-                if selected_frames and selected_frames != "Any" and frames_col:
-                    frames_pass = str(row[frames_col]).strip() == selected_frames
-                # --- Weft Head Matching ---
-                weft_head_pass = True
-                if selected_weft_head and selected_weft_head != "Any" and weft_head_col:
-                    weft_head_pass = str(row[weft_head_col]).strip() == selected_weft_head
-                # --- Final Decision ---
-                if color_pass and construction_pass and frames_pass and weft_head_pass:
-                    matches.append(idx)
-            filtered_df = df.iloc[matches].copy() if matches else pd.DataFrame()
+            with perf.span('filter'):
+                filtered_df = dataset.filter(
+                    selected_colors,
+                    match_type == "All Colors (AND)",
+                    construction=selected_construction,
+                    frames=selected_frames,
+                    weft_head=selected_weft_head,
+                )
 
             # Find matching yarn data
             yarn_matches = pd.DataFrame()
-            if (st.session_state.yarn_df is not None and 
-                not filtered_df.empty and 
-                'Design Name' in filtered_df.columns):
+            if not filtered_df.empty and 'Design Name' in filtered_df.columns:
                 design_names = filtered_df['Design Name'].unique()
-                yarn_matches = st.session_state.yarn_df[
-                    st.session_state.yarn_df['Design Name'].isin(design_names)
-                ] if 'Design Name' in st.session_state.yarn_df.columns else pd.DataFrame()
+                with perf.span('yarn_for', designs=len(design_names)):
+                    yarn_matches = dataset.yarn_for(
+                        design_names
+                    ) if 'Design Name' in dataset.yarn_df.columns else pd.DataFrame()
 
             # --- Display Results ---
             if not filtered_df.empty:
                 st.success(f"Found {len(filtered_df)} designs matching your filter criteria:")
-                st.dataframe(filtered_df)
                 if not yarn_matches.empty:
                     st.info(f"Related yarn information ({len(yarn_matches)} entries):")
-                    st.dataframe(yarn_matches)
+                    with perf.span('frame_colors'):
+                        display_frame_colors(dataset.frame_colors_for(filtered_df['Design Name']))
                 # Show metrics and tabs for results
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
@@ -906,7 +1120,8 @@ if (
                     </div>
                     """, unsafe_allow_html=True)
                 if not yarn_matches.empty:
-                    merged_color = pd.merge(filtered_df, yarn_matches, on='Design Name', how='left')
+                    with perf.span('merge', rows=len(filtered_df)):
+                        merged_color = dataset.merge(filtered_df)
                     tab1, tab2, tab3 = st.tabs([
                         "🎨 Filtered Designs", 
                         "🧶 Corresponding Yarn Specs", 
@@ -916,31 +1131,53 @@ if (
                         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                         st.subheader("🎨 Designs Matching Your Filters")
                         st.markdown(f"*Found {len(filtered_df)} designs using your filter criteria*")
-                        st.dataframe(filtered_df, use_container_width=True, height=400)
+                        show_results('filtered_df', filtered_df, key='filter_designs')
                         st.markdown('</div>', unsafe_allow_html=True)
                     with tab2:
                         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                         st.subheader("🧶 Yarn Specifications for Filtered Designs")
-                        st.dataframe(yarn_matches, use_container_width=True, height=400)
+                        show_results('yarn_matches', dataset.with_yarn_fields(yarn_matches), key='filter_yarn')
                         st.markdown('</div>', unsafe_allow_html=True)
                     with tab3:
                         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
                         st.subheader("📊 Complete Specification (Design + Yarn)")
-                        st.dataframe(merged_color, use_container_width=True, height=400)
+                        show_results('merged_color', merged_color, key='filter_complete')
                         if show_export:
-                            buffer = io.BytesIO()
-                            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                                merged_color.to_excel(writer, sheet_name='Filtered_Complete', index=False)
-                            st.download_button(
-                                label="📥 Download Filtered Specification",
-                                data=buffer.getvalue(),
-                                file_name=f"WiltonWeavers_Filtered_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            offer_download(
+                                "📥 Download Filtered Specification",
+                                {'Filtered_Complete': merged_color},
+                                ('filter',) + filter_query,
+                                "WiltonWeavers_Filtered",
+                                export_format
                             )
                         st.markdown('</div>', unsafe_allow_html=True)
+                else:
+                    show_results('filtered_df', filtered_df, key='filter_designs')
             else:
                 st.markdown("""
                 <div class="error-message">
                     ❌ No Matching Aviation Carpet Designs Found for Selected Filters
                 </div>
                 """, unsafe_allow_html=True)
+
+# --- Performance Panel ---
+perf_record = perf.record()
+if perf_record['spans']:
+    perf_log().write(perf_record)
+if show_performance:
+    with performance_panel.container():
+        st.markdown(f"**This rerun:** {perf_record['seconds'] * 1000:.0f} ms")
+        if perf_record['spans']:
+            st.dataframe(pd.DataFrame([{
+                'Stage': '  ' * span['depth'] + span['name'],
+                'ms': round(span['seconds'] * 1000, 1),
+                'Memory Δ (MB)': round(span['rss_delta'] / 2**20, 1) if span['rss_delta'] is not None else None,
+            } for span in perf_record['spans']]), hide_index=True, use_container_width=True)
+        else:
+            st.caption("No instrumented stage ran in this rerun.")
+        recent = [record for record in perf_log().tail(20) if record['label'] == 'rerun']
+        if recent:
+            st.caption(f"Median of the last {len(recent)} logged reruns: "
+                       f"{np.median([record['seconds'] for record in recent]) * 1000:.0f} ms")
+        registry_stats = dataset_registry().stats()
+        st.caption(f"Shared datasets in memory: {registry_stats['datasets']} for {registry_stats['sessions']} sessions")